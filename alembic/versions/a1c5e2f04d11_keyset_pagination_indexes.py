@@ -0,0 +1,30 @@
+"""keyset pagination indexes on (created_at, id)
+
+Revision ID: a1c5e2f04d11
+Revises: 
+Create Date: 2026-10-18 07:11:24.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c5e2f04d11'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_vendors_created_at_id", "vendors", ["created_at", "id"])
+    op.create_index("ix_food_items_created_at_id", "food_items", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_food_items_created_at_id", table_name="food_items")
+    op.drop_index("ix_vendors_created_at_id", table_name="vendors")
@@ -0,0 +1,34 @@
+"""food_items.category with its (category, is_available) index
+
+Revision ID: b7d2093e6a40
+Revises: a1c5e2f04d11
+Create Date: 2026-10-18 07:13:43.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2093e6a40'
+down_revision: Union[str, Sequence[str], None] = 'a1c5e2f04d11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing rows start as "food"; run python -m app.utils.catalog.category_backfill afterwards
+    op.add_column(
+        "food_items",
+        sa.Column("category", sa.String(length=32), nullable=False, server_default="food"),
+    )
+    op.create_index("ix_food_items_category_available", "food_items", ["category", "is_available"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_food_items_category_available", table_name="food_items")
+    op.drop_column("food_items", "category")
@@ -0,0 +1,33 @@
+"""bargain_messages.recipient_id nullable for room-wide messages
+
+Revision ID: c3e8f1a25b97
+Revises: b7d2093e6a40
+Create Date: 2026-10-18 07:20:05.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f1a25b97'
+down_revision: Union[str, Sequence[str], None] = 'b7d2093e6a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("bargain_messages") as batch_op:
+        batch_op.alter_column("recipient_id", existing_type=sa.Integer(), nullable=True)
+    # chat messages without a recipient used to be stored with recipient_id 0
+    op.execute("UPDATE bargain_messages SET recipient_id = NULL WHERE recipient_id = 0")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # fails while room-wide (NULL recipient) messages exist
+    with op.batch_alter_table("bargain_messages") as batch_op:
+        batch_op.alter_column("recipient_id", existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,38 @@
+"""unique (order_id, sequence_id) on bargain_messages
+
+Revision ID: d4f1b6c83e52
+Revises: c3e8f1a25b97
+Create Date: 2026-10-18 07:20:05.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f1b6c83e52'
+down_revision: Union[str, Sequence[str], None] = 'c3e8f1a25b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # keep the first copy of every redelivered message
+    op.execute(
+        "DELETE FROM bargain_messages WHERE id NOT IN ("
+        " SELECT keep_id FROM ("
+        "  SELECT MIN(id) AS keep_id FROM bargain_messages GROUP BY order_id, sequence_id"
+        " ) AS keep"
+        ")"
+    )
+    with op.batch_alter_table("bargain_messages") as batch_op:
+        batch_op.create_unique_constraint("uq_bargain_messages_order_seq", ["order_id", "sequence_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("bargain_messages") as batch_op:
+        batch_op.drop_constraint("uq_bargain_messages_order_seq", type_="unique")
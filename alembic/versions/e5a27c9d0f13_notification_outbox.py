@@ -0,0 +1,44 @@
+"""notification_outbox table
+
+Revision ID: e5a27c9d0f13
+Revises: d4f1b6c83e52
+Create Date: 2026-10-18 08:05:40.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a27c9d0f13'
+down_revision: Union[str, Sequence[str], None] = 'd4f1b6c83e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "notification_outbox",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("event_key", sa.String(length=128), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.String(length=512), nullable=True),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("dispatched_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("event_key", name="uq_notification_outbox_event_key"),
+    )
+    op.create_index("ix_notification_outbox_next_attempt_at", "notification_outbox", ["next_attempt_at"])
+    op.create_index("ix_notification_outbox_dispatched_at", "notification_outbox", ["dispatched_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_notification_outbox_dispatched_at", table_name="notification_outbox")
+    op.drop_index("ix_notification_outbox_next_attempt_at", table_name="notification_outbox")
+    op.drop_table("notification_outbox")
@@ -12,7 +12,7 @@ def create_app(config_name=None):
     """
     app = Flask(__name__, static_folder="../static", template_folder="../templates")
     app.config.from_object("config.Config")
-    socketio.init_app(app, cors_allowed_origins="*")
+    socketio.init_app(app, cors_allowed_origins="*", message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"])
     oauth.init_app(app)
     db_session = init_db(app)
     limiter.init_app(app)
@@ -46,6 +46,14 @@ def create_app(config_name=None):
     from app.handlers.rider_handler import rider_bp
     from app.websocket.rider_namespace import RiderNamespace
     from app.handlers.flutterwave_webhook import flutterwave
+    from app.utils.catalog.snapshot import start_catalog_listener
+    from app.utils.riders.live_location import start_location_flusher
+    from app.utils.riders.location_broadcast import start_location_broadcaster
+    from app.utils.chat.bargain_persister import start_bargain_persister
+    from app.utils.notifications.outbox import start_outbox_relay
+    from app.utils.notifications.dispatcher import start_notification_dispatcher
+    from app.whatsapp.utils.inbox import start_whatsapp_workers
+    from app.handlers.metrics import metrics_bp
 
 
 
@@ -69,9 +77,17 @@ def create_app(config_name=None):
     app.register_blueprint(rider_bp)
     app.register_blueprint(webhook_bp)
     app.register_blueprint(flutterwave)
+    app.register_blueprint(metrics_bp)
     socketio.on_namespace(BargainNamespace("/bargain"))
     socketio.on_namespace(DeliveryNamespace("/delivery"))
     socketio.on_namespace(RiderNamespace("/rider"))
+    start_catalog_listener()
+    start_location_flusher(app)
+    start_location_broadcaster()
+    start_bargain_persister(app)
+    start_outbox_relay(app)
+    start_notification_dispatcher(app)
+    start_whatsapp_workers(app)
     seed_central_account()
 
     
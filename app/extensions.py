@@ -11,7 +11,6 @@ from flask_socketio import SocketIO
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from authlib.integrations.flask_client import OAuth
-import redis
 from sqlalchemy.orm import declarative_base
 from celery import Celery
 from flask_limiter import Limiter
@@ -22,11 +21,14 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from minio import Minio
+from app.utils.redis_factory import get_redis
+from app.utils.db_engine import get_engine
+from app.utils.db_routing import RoutingSession
 
 socketio = SocketIO()
 migrate = Migrate()
 oauth = OAuth()
-r = redis.from_url("redis://localhost:6379/0", decode_responses=True)
+r = get_redis()
 Base = declarative_base()
 limiter = Limiter(key_func=get_remote_address)
 
@@ -50,12 +52,25 @@ def make_celery(app):
     celery.Task = ContextTask
     return celery
 
+class SharedEngineSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy on the process-wide engine from app/utils/db_engine.py."""
+
+    def _make_engine(self, bind_key, options, app):
+        # the configured URI as written: Flask-SQLAlchemy's defaults move a relative
+        # sqlite path into instance_path, while init_db and alembic have always used the cwd
+        url = app.config["SQLALCHEMY_DATABASE_URI"] if bind_key is None else options["url"]
+        return get_engine(url)
+
+
+# Base models and db.Model are the same declarative base, so Model.query works on both
+db = SharedEngineSQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
+
+
 def init_db(app):
-    """Initialize SQLAlchemy engine and scoped session for Base models."""
-    engine = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
-    Base.metadata.bind = engine
-    session_factory = sessionmaker(bind=engine)
-    return scoped_session(session_factory)
+    """Bind db to the app on the shared engine; returns the scoped session (db.session)."""
+    if "sqlalchemy" not in app.extensions:
+        db.init_app(app)
+    return db.session
 
 
 def init_minio(app_config):
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, make_response, current_app, g
-import jwt, datetime, redis
+import jwt, datetime, redis, uuid
 from functools import wraps
 from app.database.user_models import User
 from app.database.signinmodels import Signin
@@ -81,6 +81,8 @@ def signin_post():
                 "email": email,
                 "username": user.username,
                 "user_id": user.id,
+                "jti": uuid.uuid4().hex,   # lets signout revoke this token alone
+                "iat": datetime.datetime.utcnow(),
                 "exp": exp_time
             },
             current_app.config["JWT_SECRET"],
@@ -120,7 +122,8 @@ from app.extensions import init_db, migrate, socketio, oauth, r
 from app.database.user_models import User
 from app.database.signinmodels import Signin
 from authlib.integrations.flask_client import OAuth
-import jwt, datetime, redis, os
+from app.websocket.socket_session import revoke_token, revoke_identity
+import jwt, datetime, redis, os, uuid
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -186,7 +189,8 @@ def google_callback():
     # --- Create JWT Token ---
     exp_time = datetime.datetime.utcnow() + datetime.timedelta(minutes=15)
     jwt_token = jwt.encode(
-        {"email": user.email, "exp": exp_time},
+        {"email": user.email, "user_id": user.id, "jti": uuid.uuid4().hex,
+         "iat": datetime.datetime.utcnow(), "exp": exp_time},
         current_app.config["JWT_SECRET"],
         algorithm="HS256"
     )
@@ -199,3 +203,32 @@ def google_callback():
     resp.set_cookie("jwt", jwt_token, httponly=True, max_age=900)
     return resp
 
+
+# --- Sign out: end the web session and close the token's live sockets ---
+@auth_bp.route("/signout", methods=["POST"])
+def signout():
+    """
+    Revoke the cookie's token: the Redis session goes, and the sockets that
+    connected with it are disconnected. With ?everywhere=1 every token
+    issued to the user so far is revoked (other devices included).
+    """
+    token = request.cookies.get("jwt")
+    data = None
+    if token:
+        try:
+            # an expired token still identifies what to revoke
+            data = jwt.decode(token, current_app.config["JWT_SECRET"], algorithms=["HS256"],
+                              options={"verify_exp": False})
+        except jwt.InvalidTokenError:
+            data = None
+
+    if data:
+        r.delete(f"session:{data.get('email')}")
+        if request.args.get("everywhere") and data.get("user_id"):
+            revoke_identity({"id": data["user_id"], "type": "user"})
+        elif data.get("jti"):
+            revoke_token(data["jti"])
+
+    resp = make_response(redirect(url_for("auth.signin")))
+    resp.delete_cookie("jwt")
+    return resp
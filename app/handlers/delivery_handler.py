@@ -1,15 +1,20 @@
 from flask import Blueprint, render_template, request, jsonify
-from app.extensions import db, socketio, geolocator
+from app.extensions import db, socketio
 from app.merchants.Database.delivery import Delivery
 from app.merchants.Database.order import OrderSingle, OrderMultiple
 from app.database.user_models import User
+from app.utils.riders.geo_index import dispatch_to_nearest
+from app.utils.geo.reverse_geocode import reverse_geocode
 
 delivery_bp = Blueprint("delivery_bp", __name__)
 GLOBAL_ROOM = "all_participants"
 
 
 def broadcast_order_to_riders(latest_order, delivery, extra_address_info=None):
-    """Broadcast full order info to all riders, including address info."""
+    """
+    Offer the order, including address info, to the nearest available riders.
+    Returns the ids of the riders it was sent to.
+    """
     if not latest_order or not delivery:
         return
 
@@ -37,7 +42,10 @@ def broadcast_order_to_riders(latest_order, delivery, extra_address_info=None):
     if extra_address_info:
         order_data.update(extra_address_info)
 
-    socketio.emit("latest_order", order_data, room=GLOBAL_ROOM)
+    extra = extra_address_info or {}
+    lat = extra.get("latitude", getattr(delivery, "latitude", None))
+    lng = extra.get("longitude", getattr(delivery, "longitude", None))
+    return dispatch_to_nearest("latest_order", order_data, lat, lng)
 
 
 @delivery_bp.route("/delivery/<int:order_id>/location", methods=["GET", "POST"])
@@ -84,14 +92,14 @@ def manage_delivery_location(delivery_id):
         if not lat or not lng:
             return jsonify({"error": "Missing coordinates"}), 400
 
-        location = geolocator.reverse(f"{lat}, {lng}", language="en")
-        if not location:
+        address = reverse_geocode(lat, lng)
+        if not address:
             return jsonify({"error": "Could not resolve address"}), 400
 
-        delivery.address = location.address
+        delivery.address = address
         extra_info["latitude"] = lat
         extra_info["longitude"] = lng
-        extra_info["resolved_address"] = location.address
+        extra_info["resolved_address"] = address
         db.session.commit()
 
     else:
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from app.utils.metrics import collect_metrics
+
+metrics_bp = Blueprint("metrics_bp", __name__, url_prefix="/metrics")
+
+
+@metrics_bp.route("", methods=["GET"])
+def all_metrics():
+    """
+    Per-worker counters from every registered subsystem (caches, pools, queues).
+    Each worker reports its own values; aggregate them in the scraper.
+    """
+    return jsonify(collect_metrics()), 200
+
+
+@metrics_bp.route("/<name>", methods=["GET"])
+def subsystem_metrics(name):
+    data = collect_metrics(name)
+    if data is None:
+        return jsonify({"error": f"Unknown metrics section '{name}'"}), 404
+    return jsonify(data), 200
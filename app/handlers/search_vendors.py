@@ -1,57 +1,72 @@
 from flask import Blueprint, jsonify, request
 from app.extensions import Base, r
 from app.merchants.Database.vendors_data_base import Vendor, FoodItem
-from app.utils.minio_utils import get_minio_file_url
-import json
-from datetime import timedelta
+from app.utils.minio_utils import get_minio_file_urls, URL_REFRESH_MARGIN
+from app.utils.catalog.loader import load_menus_for_vendors
+from app.utils.pagination import wants_cursor_pagination, keyset_paginate, cached_count
+from app.utils.swr_cache import swr_cached, max_served_age
+from app.utils.http_cache import conditional_response
+from app.utils.db_routing import use_replica_for
 
 vendor_bp = Blueprint("vendor_bp", __name__)
+use_replica_for(vendor_bp)
 
-@vendor_bp.route("/vendors/dashboard", methods=["GET"])
-def vendor_dashboard():
-    """
-    Vendor Dashboard (cached for 5 minutes)
-    Shows all open vendors with optional search and pagination.
-    """
-    search = request.args.get("search", "").strip().lower()
-    page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 10))
-    offset = (page - 1) * limit
+DASHBOARD_CACHE_TTL = 300
 
-    cache_key = f"vendors_dashboard:{search or 'all'}:page:{page}:limit:{limit}"
 
-    # --- 1. Check cache first ---
-    cached_data = r.get(cache_key)
-    if cached_data:
-        print("[CACHE HIT] Returning paginated vendors from Redis cache.")
-        return jsonify(json.loads(cached_data)), 200
+def _dashboard_cache_key(search, page, limit, use_cursor, cursor, with_total):
+    if use_cursor:
+        return f"{search or 'all'}:cursor:{cursor or 'first'}:limit:{limit}:total:{int(with_total)}"
+    return f"{search or 'all'}:page:{page}:limit:{limit}"
 
-    # --- 2. Cache miss → query DB ---
-    print("[CACHE MISS] Fetching vendors from DB...")
+
+@swr_cached("vendors_dashboard", _dashboard_cache_key, ttl=DASHBOARD_CACHE_TTL, early_refresh_beta=1.0)
+def build_vendor_dashboard(search, page, limit, use_cursor, cursor, with_total):
+    """
+    Build one dashboard page from the DB (vendors + menus + MinIO URLs).
+    Cached for 5 minutes with stale-while-revalidate, so an expiring key is
+    recomputed by one request while the rest keep serving the old page.
+    """
+    offset = (page - 1) * limit
     query = Vendor.query.filter_by(is_open=True)
     if search:
         query = query.filter(Vendor.name.ilike(f"%{search}%"))
 
-    total_vendors = query.count()
-    vendors = query.offset(offset).limit(limit).all()
-
-    result = {
-        "page": page,
-        "limit": limit,
-        "total_vendors": total_vendors,
-        "total_pages": (total_vendors + limit - 1) // limit,
-        "vendors": []
-    }
+    if use_cursor:
+        # keyset on (created_at, id): no OFFSET scan and no COUNT unless asked for
+        vendors, next_cursor, prev_cursor = keyset_paginate(
+            query, Vendor.created_at, Vendor.id, limit, cursor=cursor
+        )
+
+        result = {
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "vendors": []
+        }
+        if with_total:
+            result["total_vendors"] = cached_count(f"vendors_dashboard:{search or 'all'}", query)
+    else:
+        total_vendors = query.count()
+        vendors = query.offset(offset).limit(limit).all()
+
+        result = {
+            "page": page,
+            "limit": limit,
+            "total_vendors": total_vendors,
+            "total_pages": (total_vendors + limit - 1) // limit,
+            "vendors": []
+        }
 
     # ------------------------------------------
     # Add food items (with MinIO URLs) for each vendor
     # ------------------------------------------
+    # one query for every vendor on the page instead of one per vendor
+    menus = load_menus_for_vendors([v.id for v in vendors])
+    page_items = []
+
     for v in vendors:
-        # fetch available food items for this vendor
-        food_items = FoodItem.query.filter_by(
-            vendor_id=v.id,
-            is_available=True
-        ).all()
+        food_items = menus[v.id]
 
         items_list = []
         for item in food_items:
@@ -78,19 +93,8 @@ def vendor_dashboard():
             else:
                 item_dict["available_to"] = None
 
-            # attempt to get MinIO URL (same logic as your store_handler)
-            try:
-                if item_dict["vendor_name"] and item_dict["picture_filename"]:
-                    image_url = get_minio_file_url(item_dict["vendor_name"], item_dict["picture_filename"])
-                else:
-                    image_url = None
-            except Exception as e:
-                print(f"[MINIO ERROR] vendor={v.id} item={item.id} error={e}")
-                image_url = None
-
-            item_dict["image_url"] = image_url
-
             items_list.append(item_dict)
+            page_items.append(item_dict)
 
         # append vendor entry (original vendor fields preserved)
         result["vendors"].append({
@@ -103,10 +107,38 @@ def vendor_dashboard():
             "banner_image": v.banner_image,
             "food_items": items_list
         })
+
+    # sign the MinIO URLs for the whole page in one batch (same logic as store_handler);
+    # the cached page, stale window included, must not outlive them
+    image_urls = get_minio_file_urls(
+        [(item["vendor_name"], item["picture_filename"]) for item in page_items],
+        min_valid=max_served_age(DASHBOARD_CACHE_TTL) + URL_REFRESH_MARGIN,
+    )
+    for item_dict, image_url in zip(page_items, image_urls):
+        item_dict["image_url"] = image_url
     # ------------------------------------------
 
-    # --- 3. Store in Redis with TTL (5 min) ---
-    r.setex(cache_key, timedelta(minutes=5), json.dumps(result))
+    return result
+
+
+@vendor_bp.route("/vendors/dashboard", methods=["GET"])
+def vendor_dashboard():
+    """
+    Vendor Dashboard (cached for 5 minutes)
+    Shows all open vendors with optional search and pagination.
+    Offset mode (?page=) by default; cursor mode with ?paginate=cursor or
+    ?cursor=<next_cursor|prev_cursor>, plus ?with_total=1 for a cached total.
+    """
+    search = request.args.get("search", "").strip().lower()
+    page = int(request.args.get("page", 1))
+    limit = int(request.args.get("limit", 10))
+    use_cursor = wants_cursor_pagination(request.args)
+    cursor = request.args.get("cursor") or None
+    with_total = request.args.get("with_total") == "1"
 
-    return jsonify(result), 200
+    try:
+        result, etag = build_vendor_dashboard.with_etag(search, page, limit, use_cursor, cursor, with_total)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    return conditional_response(etag, lambda: jsonify(result))
@@ -1,24 +1,19 @@
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, jsonify, request, render_template, current_app
 from app.extensions import db
 from app.merchants.Database.vendors_data_base import FoodItem
-from app.utils.minio_utils import upload_to_minio, get_minio_file_url
-from cachetools import TTLCache
+from app.utils.minio_utils import upload_to_minio, get_minio_file_url, get_minio_file_urls, URL_REFRESH_MARGIN
+from app.utils.catalog.loader import load_available_items
+from app.utils.catalog.categories import DIARY_CATEGORIES
+from app.utils.catalog.snapshot import (
+    register_snapshot, get_snapshot_json, get_snapshot, snapshot_version, SNAPSHOT_MAX_AGE,
+)
+from app.utils.http_cache import make_etag, conditional_response
+from app.utils.db_routing import use_replica_for
 from datetime import datetime
 import base64
 
 store_bp = Blueprint("store_bp", __name__, template_folder="../../templates")
-
-# In-memory cache: max 200 items, 5 minutes TTL
-store_cache = TTLCache(maxsize=200, ttl=300)
-
-def get_cached_data(key):
-    return store_cache.get(key)
-
-def set_cached_data(key, value):
-    store_cache[key] = value
-
-def clear_cache():
-    store_cache.clear()
+use_replica_for(store_bp)
 
 
 def wants_json_response():
@@ -29,6 +24,60 @@ def wants_json_response():
     return "application/json" in request.headers.get("Accept", "")
 
 
+# ---------------------- Catalog snapshots ----------------------
+# Built once per catalog version and shared by every worker through Redis.
+def _serialize_items(items):
+    # a snapshot can be served for SNAPSHOT_MAX_AGE seconds, so its image URLs must outlive it
+    image_urls = get_minio_file_urls(
+        [(item.vendor_name, item.picture_filename) for item in items],
+        min_valid=SNAPSHOT_MAX_AGE + URL_REFRESH_MARGIN,
+    )
+    data = []
+    for item, image_url in zip(items, image_urls):
+        item_dict = item.to_dict()
+        item_dict["image_url"] = image_url
+        data.append(item_dict)
+    return data
+
+
+@register_snapshot("all_items")
+def build_all_items():
+    return _serialize_items(load_available_items())
+
+
+@register_snapshot("diary_items")
+def build_diary_items():
+    return _serialize_items(load_available_items(FoodItem.category.in_(DIARY_CATEGORIES)))
+
+
+@register_snapshot("food_items")
+def build_food_items():
+    # everything not on the diary page, including categories no longer in the rules
+    return _serialize_items(load_available_items(~FoodItem.category.in_(DIARY_CATEGORIES)))
+
+
+def snapshot_response(name, template):
+    """
+    Serve a catalog snapshot as JSON or HTML.
+    The JSON body is assembled around the pre-serialized item list, so
+    nothing is re-encoded per request. The ETag comes from the snapshot
+    version alone, so a revalidation that hits answers 304 without
+    loading the snapshot at all.
+    """
+    version = snapshot_version()
+    as_json = wants_json_response()
+    etag = make_etag(name, version, "json" if as_json else "html")
+
+    def build():
+        if as_json:
+            _, data_json = get_snapshot_json(name, version)
+            body = f'{{"source": "snapshot", "version": "{version}", "data": {data_json}}}'
+            return current_app.response_class(body, status=200, mimetype="application/json")
+        return render_template(template, items=get_snapshot(name, version))
+
+    return conditional_response(etag, build)
+
+
 @store_bp.route("/store", methods=["GET", "POST"])
 def store_handler():
     """
@@ -36,28 +85,8 @@ def store_handler():
     Includes MinIO image logic + page rendering.
     """
     if request.method == "GET":
-        cached = get_cached_data("all_items")
-        if cached:
-            data = cached
-        else:
-            items = FoodItem.query.filter_by(is_available=True).all()
-            data = []
-            for item in items:
-                item_dict = item.to_dict()
-                try:
-                    image_url = get_minio_file_url(item.vendor_name, item.picture_filename)
-                    item_dict["image_url"] = image_url
-                except Exception as e:
-                    print(f"[MINIO ERROR] {e}")
-                    item_dict["image_url"] = None
-                data.append(item_dict)
-            set_cached_data("all_items", data)
-
         # 🧠 Render HTML or return JSON automatically
-        if wants_json_response():
-            return jsonify({"source": "cache" if cached else "db", "data": data}), 200
-        else:
-            return render_template("store.html", items=data)
+        return snapshot_response("all_items", "store.html")
 
     elif request.method == "POST":
         payload = request.get_json()
@@ -93,8 +122,8 @@ def store_handler():
                     if payload.get("available_to") else None,
             )
             db.session.add(new_item)
+            # the commit bumps the catalog version, invalidating every worker's snapshots
             db.session.commit()
-            clear_cache()
             return jsonify({"message": "Item added successfully", "item": new_item.to_dict()}), 201
 
         except Exception as e:
@@ -105,59 +134,14 @@ def store_handler():
 @store_bp.route("/store/diary", methods=["GET"])
 def store_diary():
     """
-    Sub-handler for diary items (cached, with MinIO URLs, and page rendering).
+    Sub-handler for diary items (shared snapshot, with MinIO URLs, and page rendering).
     """
-    cached = get_cached_data("diary_items")
-    if cached:
-        data = cached
-    else:
-        items = FoodItem.query.filter(
-            FoodItem.is_available == True,
-            FoodItem.name.ilike("%milk%") | FoodItem.name.ilike("%cheese%") | FoodItem.name.ilike("%butter%")
-        ).all()
-        data = []
-        for item in items:
-            item_dict = item.to_dict()
-            try:
-                item_dict["image_url"] = get_minio_file_url(item.vendor_name, item.picture_filename)
-            except:
-                item_dict["image_url"] = None
-            data.append(item_dict)
-        set_cached_data("diary_items", data)
-
-    if wants_json_response():
-        return jsonify({"source": "cache" if cached else "db", "data": data}), 200
-    else:
-        return render_template("store_diary.html", items=data)
+    return snapshot_response("diary_items", "store_diary.html")
 
 
 @store_bp.route("/store/food", methods=["GET"])
 def store_food():
     """
-    Sub-handler for general food items (cached, with MinIO URLs, and page rendering).
+    Sub-handler for general food items (shared snapshot, with MinIO URLs, and page rendering).
     """
-    cached = get_cached_data("food_items")
-    if cached:
-        data = cached
-    else:
-        items = FoodItem.query.filter(
-            FoodItem.is_available == True,
-            ~FoodItem.name.ilike("%milk%"),
-            ~FoodItem.name.ilike("%cheese%"),
-            ~FoodItem.name.ilike("%butter%")
-        ).all()
-        data = []
-        for item in items:
-            item_dict = item.to_dict()
-            try:
-                item_dict["image_url"] = get_minio_file_url(item.vendor_name, item.picture_filename)
-            except:
-                item_dict["image_url"] = None
-            data.append(item_dict)
-        set_cached_data("food_items", data)
-
-    if wants_json_response():
-        return jsonify({"source": "cache" if cached else "db", "data": data}), 200
-    else:
-        return render_template("store_food.html", items=data)
-
+    return snapshot_response("food_items", "store_food.html")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Boolean, UniqueConstraint
 from app.extensions import Base
 
 class Notification(Base):
@@ -31,12 +31,17 @@ class BargainMessage(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     order_id = Column(String(64), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    recipient_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # NULL: sent to the whole room
     message = Column(String(512), nullable=False)
     meta = Column(JSON, nullable=True)
     sequence_id = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # the write-behind persister relies on this to make redelivered batches idempotent
+        UniqueConstraint("order_id", "sequence_id", name="uq_bargain_messages_order_seq"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -49,3 +54,19 @@ class BargainMessage(Base):
             "created_at": self.created_at.isoformat(),
         }
 
+
+class NotificationOutbox(Base):
+    """
+    Notification events written in the same transaction as the order, and
+    relayed to Redis, Socket.IO and Celery afterwards (app/utils/notifications/outbox.py).
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_key = Column(String(128), nullable=False, unique=True)  # e.g. notification:42
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(512), nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    dispatched_at = Column(DateTime, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,11 +1,12 @@
 from datetime import datetime, time
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean, ForeignKey,
-    DateTime, Time, JSON, UniqueConstraint
+    DateTime, Time, JSON, UniqueConstraint, Index, event
 )
 from sqlalchemy.orm import relationship
 from app.extensions import Base
 from app.database.user_models import User
+from app.utils.catalog.categories import classify
 
 
 # ---------------------- Vendor ----------------------
@@ -31,6 +32,10 @@ class Vendor(Base):
     menu_items = relationship("FoodItem", back_populates="vendor", cascade="all, delete-orphan")
     merchants = relationship("ProfileMerchant", backref="vendor", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_vendors_created_at_id", "created_at", "id"),  # keyset pagination order
+    )
+
     def to_dict(self, include_menu=False):
         data = {
             "id": self.id,
@@ -101,6 +106,7 @@ class FoodItem(Base):
     available_from = Column(Time, nullable=True)
     available_to = Column(Time, nullable=True)
     is_available = Column(Boolean, default=True)
+    category = Column(String(32), nullable=False, default="food", server_default="food")  # set from the category rules on write
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -109,6 +115,11 @@ class FoodItem(Base):
     vendor = relationship("Vendor", backref="food_items", lazy="joined")
     merchant = relationship("Merchant", backref="food_items", lazy="joined")
 
+    __table_args__ = (
+        Index("ix_food_items_category_available", "category", "is_available"),
+        Index("ix_food_items_created_at_id", "created_at", "id"),  # keyset pagination order
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -121,5 +132,13 @@ class FoodItem(Base):
             "available_from": self.available_from.strftime("%H:%M") if self.available_from else None,
             "available_to": self.available_to.strftime("%H:%M") if self.available_to else None,
             "is_available": self.is_available,
+            "category": self.category,
         }
 
+
+@event.listens_for(FoodItem, "before_insert")
+@event.listens_for(FoodItem, "before_update")
+def _classify_food_item(mapper, connection, target):
+    """Classify items when they are written so category pages are plain indexed lookups."""
+    target.category = classify(target)
+
@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.extensions import r, socketio  # r = Redis client
-from app.database.user_models import User
-from app.database.rider_models import Rider
+from app.extensions import socketio
+from app.utils.riders.order_claim import claim_order, unclaim_order, NOT_CLAIMED, NOT_OWNER
+from app.utils.riders.profile import get_rider_profile
 
 accept_order_bp = Blueprint("accept_order_bp", __name__, url_prefix="/rider")
 
@@ -21,32 +21,19 @@ def accept_order():
     rider_identity = get_jwt_identity()
     rider_id = rider_identity.get("id")
 
-    # Key in Redis for this order
-    redis_key = f"order:{order_id}:accepted_by"
+    # One atomic claim: exactly one rider wins, and we get the customer's id back
+    won, accepted_by, user_id = claim_order(order_id, rider_id)
+    if not won:
+        return jsonify({"error": "Order already accepted", "rider_id": accepted_by}), 409
 
-    # Atomically set the order if not already accepted
-    accepted_by = r.get(redis_key)
-    if accepted_by:
-        return jsonify({"error": "Order already accepted", "rider_id": accepted_by.decode()}), 409
-
-    r.set(redis_key, rider_id)  # First rider wins
-    r.expire(redis_key, 60*60)  # Optional: expire after 1 hour
-
-    # Get user_id to notify
-    user_id = r.get(f"order:{order_id}:user_id")
     if not user_id:
         return jsonify({"error": "User info not found"}), 500
 
-    # Get rider info to send to user
-    rider = Rider.query.get(rider_id)
-    user_info = {
-        "rider_id": rider.id,
-        "rider_name": getattr(rider.user, "name", ""),
-        "rider_phone": getattr(rider.user, "phone", ""),
-    }
+    # Rider info for the user, cached in Redis
+    user_info = get_rider_profile(rider_id)
 
     # Send to user room
-    socketio.emit("order_accepted", {"order_id": order_id, "rider": user_info}, room=f"user:{user_id.decode()}")
+    socketio.emit("order_accepted", {"order_id": order_id, "rider": user_info}, room=f"user:{user_id}")
 
     return jsonify({"message": "Order accepted", "rider_id": rider_id}), 200
 
@@ -64,15 +51,11 @@ def unaccept_order():
 
     rider_identity = get_jwt_identity()
     rider_id = rider_identity.get("id")
-    redis_key = f"order:{order_id}:accepted_by"
-
-    accepted_by = r.get(redis_key)
-    if not accepted_by:
+    result = unclaim_order(order_id, rider_id)
+    if result == NOT_CLAIMED:
         return jsonify({"error": "Order not marked"}), 404
 
-    if accepted_by.decode() != str(rider_id):
+    if result == NOT_OWNER:
         return jsonify({"error": "You cannot unmark this order"}), 403
 
-    r.delete(redis_key)
     return jsonify({"message": "Order unmarked"}), 200
-
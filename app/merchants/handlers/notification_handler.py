@@ -5,9 +5,7 @@ from app.merchants.Database.notifications import Notification
 from app.merchants.Database.vendors_data_base import FoodItem
 from app.merchants.Database.order import OrderSingle, OrderMultiple
 from app.database.user_models import User
-from app.utils.tasks import (
-    send_notification_async, send_whatsapp_message, send_email_notification
-)
+from app.utils.notifications.outbox import add_notifications
 
 notification_bp = Blueprint("notifications", __name__)
 
@@ -69,16 +67,10 @@ def notify_vendor_from_order():
             db.session.add(notif)
             notifications.append(notif)
 
+    # delivered by the outbox relay once this commit lands
+    add_notifications(notifications)
     db.session.commit()
 
-    # Send notifications through Redis + background tasks
-    for notif in notifications:
-        notif_dict = notif.to_dict()
-        r.publish("notifications", notif_dict)
-        send_notification_async.delay(notif.id)
-        send_whatsapp_message.delay(notif.user_id, notif_dict)
-        send_email_notification.delay(notif.user_id, notif_dict)
-
     return jsonify({
         "message": "Vendor(s) notified successfully",
         "order_id": order.id,
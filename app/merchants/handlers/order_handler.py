@@ -10,12 +10,9 @@ try:
     from app.merchants.Database.order import OrderSingle, OrderMultiple
     from app.merchants.Database.notifications import Notification
     from app.utils.decorators import token_required
-    from app.utils.tasks import (
-    send_notification_async,
-    send_whatsapp_message,
-    send_email_notification,
-    )
+    from app.utils.notifications.outbox import add_notifications
     from app.utils.jwt_tools import encode_token  # <-- you must have this or similar helper
+    from app.utils.db_routing import replica_reads
 except ImportError as e:
     raise RuntimeError(
         "Replace app.database.* imports with your real models. "
@@ -25,6 +22,7 @@ order_bp = Blueprint("order_bp", __name__)
 
 
 @order_bp.route("/order/multiple", methods=["POST", "GET"])
+@replica_reads
 @token_required
 @vendor_must_be_open
 def multiple_order_handler():
@@ -64,7 +62,7 @@ def multiple_order_handler():
             created_at=datetime.utcnow(),
         )
         db.session.add(order)
-        db.session.commit()
+        db.session.flush()
 
         # =============== CREATE NOTIFICATIONS PER VENDOR ===============
         notif_objects = []
@@ -83,15 +81,10 @@ def multiple_order_handler():
             notif_objects.append(notif)
             # Delete previous single orders for this user
         OrderSingle.query.filter_by(user_id=g.user.id).delete()
-        db.session.commit()
 
-        # =============== REDIS + CELERY ===============
-        for notif in notif_objects:
-            notif_dict = notif.to_dict()
-            r.publish("notifications", notif_dict)
-            send_notification_async.delay(notif.id)
-            send_whatsapp_message.delay(notif.user_id, notif_dict)
-            send_email_notification.delay(notif.user_id, notif_dict)
+        # order, notifications and their outbox events commit together; the relay fans out
+        add_notifications(notif_objects)
+        db.session.commit()
 
         # =============== REDIRECT LOGIC ===============
         is_vendor = Vendor.query.filter_by(user_id=g.user.id).first() is not None
@@ -137,18 +130,16 @@ from app.database.user_models import User
 from app.merchants.Database.order import OrderSingle
 from app.merchants.Database.notifications import Notification
 from app.utils.decorators import token_required
-from app.utils.tasks import (
-    send_notification_async,
-    send_whatsapp_message,
-    send_email_notification,
-)
+from app.utils.notifications.outbox import add_notifications
 from app.utils.jwt_tools import encode_token  # <-- import your JWT utility
 from app.utils.vendor_status import vendor_must_be_open
+from app.utils.db_routing import replica_reads
 
 order_bp = Blueprint("order_bp", __name__)
 
 
 @order_bp.route("/order/single", methods=["POST", "GET"])
+@replica_reads
 @token_required
 @vendor_must_be_open
 def single_order_handler():
@@ -178,7 +169,7 @@ def single_order_handler():
         db.session.add(order)
         # Delete previous single orders for this user
         OrderSingle.query.filter_by(user_id=g.user.id).delete()
-        db.session.commit()
+        db.session.flush()
 
         # =============== CREATE NOTIFICATION ===============
         notif = Notification(
@@ -192,16 +183,10 @@ def single_order_handler():
             },
         )
         db.session.add(notif)
-        db.session.commit()
 
-        # =============== REDIS + CELERY ===============
-        notif_dict = notif.to_dict()
-        r.publish("notifications", notif_dict)
-
-        # background async sends
-        send_notification_async.delay(notif.id)
-        send_whatsapp_message.delay(item.vendor_id, notif_dict)
-        send_email_notification.delay(item.vendor_id, notif_dict)
+        # order, notification and its outbox event commit together; the relay fans out
+        add_notifications([notif])
+        db.session.commit()
 
         # =============== REDIRECT LOGIC ===============
         is_vendor = Vendor.query.filter_by(user_id=g.user.id).first() is not None
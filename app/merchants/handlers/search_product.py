@@ -1,68 +1,94 @@
 from flask import Blueprint, jsonify, request
 from app.extensions import Base, r
 from app.merchants.Database.vendors_data_base import FoodItem
-from app.utils.minio_utils import get_minio_file_url
-import json
-from datetime import timedelta
+from app.utils.minio_utils import get_minio_file_urls, URL_REFRESH_MARGIN
+from app.utils.search.product_index import search_product_ids, search_product_cursor
+from app.utils.pagination import wants_cursor_pagination
+from app.utils.catalog.loader import load_items_by_ids
+from app.utils.swr_cache import swr_cached, max_served_age
+from app.utils.http_cache import conditional_response
+from app.utils.db_routing import use_replica_for
 
 search_bp = Blueprint("search_bp", __name__)
+use_replica_for(search_bp)
 
-@search_bp.route("/searchbyproduct", methods=["GET"])
-def search_by_product():
-    """
-    Search food items by product name.
-    Cached by search term.
-    Returns paginated list of items with MinIO image URLs.
-    """
-    search_query = request.args.get("q", "").strip().lower()
-    page = int(request.args.get("page", 1))
-    per_page = int(request.args.get("per_page", 10))
+SEARCH_CACHE_TTL = 300
 
-    if not search_query:
-        return jsonify({"error": "Missing search term ?q=<product_name>"}), 400
 
-    cache_key = f"search:{search_query}:page:{page}:per_page:{per_page}"
+def _search_cache_key(search_query, page, per_page, use_cursor, cursor):
+    if use_cursor:
+        return f"{search_query}:cursor:{cursor or 'first'}:per_page:{per_page}"
+    return f"{search_query}:page:{page}:per_page:{per_page}"
 
-    cached_data = r.get(cache_key)
-    if cached_data:
-        print(f"[CACHE HIT] Returning '{search_query}' page {page} from Redis.")
-        return jsonify(json.loads(cached_data)), 200
 
-    print(f"[CACHE MISS] Querying DB for '{search_query}' page {page}...")
-
-    query = (
-        FoodItem.query
-        .filter(FoodItem.name.ilike(f"%{search_query}%"))
-        .filter(FoodItem.is_available == True)
-        .order_by(FoodItem.created_at.desc())
-    )
+@swr_cached("search", _search_cache_key, ttl=SEARCH_CACHE_TTL)
+def build_search_results(search_query, page, per_page, use_cursor, cursor):
+    """
+    Run one search page against the BM25 index and load its rows.
+    Cached for 5 minutes with stale-while-revalidate.
+    """
+    if use_cursor:
+        item_ids, next_cursor, prev_cursor, total_items = search_product_cursor(
+            search_query, limit=per_page, cursor=cursor
+        )
+    else:
+        item_ids, total_items = search_product_ids(search_query, page=page, per_page=per_page)
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    items = pagination.items
+    # --- Load only this page's rows, keeping the ranked order ---
+    items = load_items_by_ids(item_ids)
 
     # --- Build result list with MinIO URLs ---
+    # the cached page, stale window included, must not outlive its image URLs
+    image_urls = get_minio_file_urls(
+        [(item.vendor_name, item.picture_filename) for item in items],
+        min_valid=max_served_age(SEARCH_CACHE_TTL) + URL_REFRESH_MARGIN,
+    )
     result_items = []
-    for item in items:
+    for item, image_url in zip(items, image_urls):
         item_dict = item.to_dict()
-        try:
-            # Assuming vendor_name and picture_filename are columns
-            minio_url = get_minio_file_url(item.vendor_name, item.picture_filename)
-            item_dict["image_url"] = minio_url
-        except Exception as e:
-            print(f"[MINIO ERROR] {e}")
-            item_dict["image_url"] = None
-
+        item_dict["image_url"] = image_url
         result_items.append(item_dict)
 
-    result = {
+    if use_cursor:
+        return {
+            "search_term": search_query,
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "total_items": total_items,
+            "items": result_items,
+        }
+    return {
         "search_term": search_query,
         "page": page,
         "per_page": per_page,
-        "total_items": pagination.total,
-        "total_pages": pagination.pages,
+        "total_items": total_items,
+        "total_pages": (total_items + per_page - 1) // per_page,
         "items": result_items,
     }
 
-    r.setex(cache_key, timedelta(minutes=5), json.dumps(result))
-    return jsonify(result), 200
 
+@search_bp.route("/searchbyproduct", methods=["GET"])
+def search_by_product():
+    """
+    Search food items by product name, item name, description or vendor.
+    Results come from the BM25 inverted index and are cached by search term.
+    Returns paginated list of items with MinIO image URLs.
+    Offset mode (?page=) by default; cursor mode with ?paginate=cursor or
+    ?cursor=<next_cursor|prev_cursor>.
+    """
+    search_query = request.args.get("q", "").strip().lower()
+    page = int(request.args.get("page", 1))
+    per_page = int(request.args.get("per_page", 10))
+    use_cursor = wants_cursor_pagination(request.args)
+    cursor = request.args.get("cursor") or None
+
+    if not search_query:
+        return jsonify({"error": "Missing search term ?q=<product_name>"}), 400
+
+    try:
+        result, etag = build_search_results.with_etag(search_query, page, per_page, use_cursor, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return conditional_response(etag, lambda: jsonify(result))
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, g, current_app
 from datetime import datetime, timedelta
 from app.extensions import db, r, socketio
+from app.utils.redis_factory import get_redis, PUBSUB
 from app.database.vendor_models import Vendor
 from app.database.vendor_status import VendorStatusLog
 from app.utils.auth import verify_jwt_token  # your auth decorator that yields current_user
@@ -85,7 +86,7 @@ def set_vendor_status(current_user):
         current_app.logger.warning(f"SocketIO emit failed: {e}")
 
     # publish a Redis message (for other instances to pick up if they don't use socketio message_queue)
-    r.publish("vendor_status_changes", json.dumps(payload))
+    get_redis(PUBSUB).publish("vendor_status_changes", json.dumps(payload))
 
     current_app.logger.info(f"Vendor {vendor.id} status changed from {old_status} to {new_status} by user {current_user.id}")
 
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.extensions import db
 from app.database.models import Wishlist, FoodItem
+from app.utils.catalog.loader import load_items_by_ids
 from flask_login import current_user  # or however you manage auth
 
 wishlist_bp = Blueprint("wishlist_bp", __name__)
@@ -42,13 +43,13 @@ def get_wishlist():
     if not current_user.is_authenticated:
         return jsonify({"error": "Unauthorized"}), 401
 
-    wishlist_items = (
-        Wishlist.query
+    item_ids = [
+        item_id for (item_id,) in
+        db.session.query(Wishlist.item_id)
         .filter_by(user_id=current_user.id)
-        .join(FoodItem)
-        .add_entity(FoodItem)
-        .all()
-    )
+        .order_by(Wishlist.added_at.desc())
+    ]
+    food_items = load_items_by_ids(item_ids, with_vendor=True)
 
     data = [
         {
@@ -58,7 +59,7 @@ def get_wishlist():
             "vendor": food_item.vendor.name,
             "image": food_item.image_url,
         }
-        for _, food_item in wishlist_items
+        for food_item in food_items
     ]
 
     return jsonify(data), 200
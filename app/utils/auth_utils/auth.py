@@ -3,14 +3,19 @@ from flask import current_app
 from app.database.user_models import User
 from app.extensions import Base
 
-def verify_jwt_socket(token):
+def decode_jwt_socket(token):
+    """The socket token's payload, or None if it does not verify."""
     try:
-        payload = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
-        return db.session.get(User, payload.get("user_id"))
+        return jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
     except Exception:
         return None
 
 
+def verify_jwt_socket(token):
+    payload = decode_jwt_socket(token)
+    return db.session.get(User, payload.get("user_id")) if payload else None
+
+
 
 
 import jwt
@@ -0,0 +1,61 @@
+import json
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Default taxonomy. Rules are checked in order; the first rule with a keyword
+# found in the item's name wins, otherwise the item gets the default category.
+# Override with a JSON file of the same shape via CATEGORY_RULES_FILE.
+DEFAULT_TAXONOMY = {
+    "default": "food",
+    "fields": ["item_name", "product_name"],
+    "rules": [
+        {"category": "dairy", "keywords": ["milk", "cheese", "butter"], "exclude": []},
+    ],
+}
+
+# store pages -> categories they list
+DIARY_CATEGORIES = ["dairy"]
+
+
+def load_taxonomy(path=None):
+    """Load the taxonomy from a JSON file, falling back to the built-in default."""
+    path = path or Config.CATEGORY_RULES_FILE
+    if not path:
+        return DEFAULT_TAXONOMY
+    try:
+        with open(path) as fh:
+            taxonomy = json.load(fh)
+    except (OSError, ValueError):
+        logger.exception("Could not load category rules from %s; using defaults", path)
+        return DEFAULT_TAXONOMY
+    taxonomy.setdefault("default", DEFAULT_TAXONOMY["default"])
+    taxonomy.setdefault("fields", DEFAULT_TAXONOMY["fields"])
+    taxonomy.setdefault("rules", [])
+    return taxonomy
+
+
+TAXONOMY = load_taxonomy()
+
+
+def all_categories(taxonomy=TAXONOMY):
+    categories = [rule["category"] for rule in taxonomy["rules"]]
+    if taxonomy["default"] not in categories:
+        categories.append(taxonomy["default"])
+    return categories
+
+
+def classify(item, taxonomy=TAXONOMY):
+    """
+    Category for a FoodItem (or any object with the taxonomy's fields).
+    Keywords are matched as case-insensitive substrings, the same test the
+    old ilike('%milk%') filters applied at read time.
+    """
+    text = " ".join(str(getattr(item, field, None) or "") for field in taxonomy["fields"]).lower()
+    for rule in taxonomy["rules"]:
+        if any(word in text for word in rule.get("exclude", [])):
+            continue
+        if any(word in text for word in rule.get("keywords", [])):
+            return rule["category"]
+    return taxonomy["default"]
@@ -0,0 +1,60 @@
+"""
+Backfill food_items.category for rows written before categories existed,
+or after the category rules change.
+
+    python -m app.utils.catalog.category_backfill
+"""
+import logging
+from app.extensions import db
+from app.merchants.Database.vendors_data_base import FoodItem
+from app.utils.catalog.categories import classify
+from app.utils.catalog.snapshot import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_categories(batch_size=500):
+    """
+    Reclassify every FoodItem in id order, committing one batch at a time.
+    Only rows whose category actually changes are written.
+    Returns the number of rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(FoodItem.id, FoodItem.item_name, FoodItem.product_name, FoodItem.category)
+            .filter(FoodItem.id > last_id)
+            .order_by(FoodItem.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        changes = []
+        for row in rows:
+            category = classify(row)
+            if category != row.category:
+                changes.append({"id": row.id, "category": category})
+
+        if changes:
+            db.session.bulk_update_mappings(FoodItem, changes)
+            db.session.commit()
+            updated += len(changes)
+
+        last_id = rows[-1].id
+        logger.info("Category backfill at id %s, %s rows updated so far", last_id, updated)
+
+    if updated:
+        # bulk updates skip the mapper events, so invalidate the store snapshots here
+        bump_catalog_version()
+    return updated
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        print(f"Updated {backfill_categories()} food items")
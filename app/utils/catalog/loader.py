@@ -0,0 +1,91 @@
+from sqlalchemy.orm import joinedload, noload
+from app.merchants.Database.vendors_data_base import FoodItem
+
+
+def _item_query(with_vendor=False):
+    """
+    FoodItem query without the default joined eager loads.
+    The catalog views only read item columns, so the vendor/merchant JOINs
+    are skipped unless the caller asks for the vendor.
+    """
+    vendor_option = joinedload(FoodItem.vendor) if with_vendor else noload(FoodItem.vendor)
+    return FoodItem.query.options(vendor_option, noload(FoodItem.merchant))
+
+
+def load_menus_for_vendors(vendor_ids, available_only=True):
+    """
+    Load the menu of every vendor on a page in one IN (...) query.
+    Returns {vendor_id: [FoodItem, ...]} with an entry (possibly empty) per vendor.
+    """
+    menus = {vendor_id: [] for vendor_id in vendor_ids}
+    if not menus:
+        return menus
+
+    query = _item_query().filter(FoodItem.vendor_id.in_(list(menus)))
+    if available_only:
+        query = query.filter(FoodItem.is_available == True)
+
+    for item in query.order_by(FoodItem.vendor_id, FoodItem.id):
+        menus[item.vendor_id].append(item)
+    return menus
+
+
+def load_items_by_ids(item_ids, with_vendor=False):
+    """
+    Load FoodItems by id in one query, returned in the order of item_ids.
+    Ids that no longer exist are skipped.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return []
+
+    rows = _item_query(with_vendor).filter(FoodItem.id.in_(item_ids)).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in item_ids if i in by_id]
+
+
+def load_available_items(*criteria):
+    """Load every available FoodItem matching optional extra filter criteria."""
+    return _item_query().filter(FoodItem.is_available == True, *criteria).all()
+
+
+if __name__ == "__main__":
+    # Query-count check on a scratch SQLite file: a page's menus cost one
+    # statement however many vendors are on it.
+    #   python -m app.utils.catalog.loader
+    import os
+    import tempfile
+    from flask import Flask
+    from sqlalchemy import event
+    from config import Config
+    from app.extensions import Base, db, init_db
+    from app.merchants.Database.vendors_data_base import Vendor
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loader.db')}"
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    init_db(app)
+
+    with app.app_context():
+        Base.metadata.create_all(db.engine, tables=[Vendor.__table__, FoodItem.__table__])
+        db.session.execute(Vendor.__table__.insert(), [
+            {"id": v, "Business_name": f"vendor {v}", "Business_address": "-",
+             "Bussiness_account": v, "bank_code": "000", "account_number": "0"}
+            for v in range(1, 51)
+        ])
+        db.session.execute(FoodItem.__table__.insert(), [
+            {"vendor_id": v, "merchant_id": v, "product_name": f"item {v}.{i}", "vendor_name": f"vendor {v}",
+             "price": 1.0, "item_name": f"item {v}.{i}", "item_description": "-", "is_available": True}
+            for v in range(1, 51) for i in range(3)
+        ])
+        db.session.commit()
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        for vendor_count in (1, 10, 50):
+            statements.clear()
+            menus = load_menus_for_vendors(range(1, vendor_count + 1))
+            assert sum(len(items) for items in menus.values()) == 3 * vendor_count
+            assert len(statements) == 1, f"{vendor_count} vendors took {len(statements)} queries"
+            print(f"{vendor_count:>2} vendors -> {len(statements)} query")
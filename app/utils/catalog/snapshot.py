@@ -0,0 +1,218 @@
+import json
+import time
+import logging
+import threading
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.extensions import r
+from app.utils.redis_factory import get_redis, PUBSUB
+from app.utils.db_routing import primary_reads
+from app.merchants.Database.vendors_data_base import FoodItem
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Redis key patterns
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_SNAPSHOT_KEY = "catalog:snapshot:{version}:{name}"
+CATALOG_BUILD_LOCK = "catalog:build_lock:{version}:{name}"
+CATALOG_CHANNEL = "catalog_version_changes"
+
+SNAPSHOT_TTL = 24 * 3600    # old versions fall out of Redis on their own
+# snapshots embed presigned image URLs, so they are also rebuilt once per
+# max-age window even when the catalog itself has not changed
+SNAPSHOT_MAX_AGE = Config.CATALOG_SNAPSHOT_MAX_AGE
+BUILD_LOCK_TTL = 30         # seconds one worker may spend building a snapshot
+BUILD_WAIT = 5              # seconds other workers wait for that build
+BUILD_POLL_INTERVAL = 0.05
+RECONNECT_BACKOFF = 1       # seconds before resubscribing; doubles per failure
+RECONNECT_BACKOFF_MAX = 30
+
+# name -> callable returning a JSON-serializable list
+_builders = {}
+
+# worker-local state, refreshed by the pub/sub listener when it runs
+_state = {"version": None, "listening": False, "started": False}
+_local = {}  # name -> (version, json_text)
+_parsed = {}  # name -> (version, python object)
+_local_lock = threading.Lock()
+
+# session.info flag set when a FoodItem changed in the current transaction
+_DIRTY_KEY = "catalog_dirty"
+
+
+def register_snapshot(name):
+    """Decorator registering the function that builds a named catalog snapshot."""
+    def decorator(fn):
+        _builders[name] = fn
+        return fn
+    return decorator
+
+
+def get_catalog_version():
+    """Current catalog version; from memory when the listener is running, else one GET."""
+    if _state["listening"] and _state["version"] is not None:
+        return _state["version"]
+    return int(r.get(CATALOG_VERSION_KEY) or 0)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every worker's snapshots after a catalog write.
+    Call after the DB commit so the next build sees the new rows.
+    """
+    version = r.incr(CATALOG_VERSION_KEY)
+    _state["version"] = version
+    get_redis(PUBSUB).publish(CATALOG_CHANNEL, json.dumps({"version": version}))
+    return version
+
+
+def _build(name):
+    # snapshots are shared by every worker for a whole version, so they are
+    # read from the primary: a lagging replica would pin stale data into them
+    with primary_reads():
+        return json.dumps(_builders[name]())
+
+
+def _build_shared(name, version):
+    """Build a snapshot once per version across all workers, guarded by a Redis lock."""
+    key = CATALOG_SNAPSHOT_KEY.format(version=version, name=name)
+    lock_key = CATALOG_BUILD_LOCK.format(version=version, name=name)
+
+    if r.set(lock_key, "1", nx=True, ex=BUILD_LOCK_TTL):
+        try:
+            text = _build(name)
+            r.set(key, text, ex=SNAPSHOT_TTL)
+            return text
+        finally:
+            r.delete(lock_key)
+
+    # another worker is building this version: wait for it, then build ourselves as a fallback
+    deadline = time.time() + BUILD_WAIT
+    while time.time() < deadline:
+        time.sleep(BUILD_POLL_INTERVAL)
+        text = r.get(key)
+        if text is not None:
+            return text
+    logger.warning("Timed out waiting for catalog snapshot %s v%s; building locally", name, version)
+    return _build(name)
+
+
+def snapshot_version():
+    """
+    Version string snapshots are keyed by: the catalog version plus the
+    SNAPSHOT_MAX_AGE epoch, so snapshots (and their signed URLs) roll over
+    even when the catalog does not change. Cheap enough to build ETags from.
+    """
+    return f"{get_catalog_version()}.{int(time.time() // SNAPSHOT_MAX_AGE)}"
+
+
+def get_snapshot_json(name, version=None):
+    """
+    Return (version, json_text) for a named snapshot.
+    Served from worker memory when the version is unchanged, otherwise from
+    Redis, and built at most once per version when Redis has none.
+    """
+    version = version or snapshot_version()
+    with _local_lock:
+        cached = _local.get(name)
+    if cached and cached[0] == version:
+        return cached
+
+    text = r.get(CATALOG_SNAPSHOT_KEY.format(version=version, name=name))
+    if text is None:
+        text = _build_shared(name, version)
+
+    with _local_lock:
+        _local[name] = (version, text)
+    return version, text
+
+
+def get_snapshot(name, version=None):
+    """Parsed snapshot, for callers that need Python objects (e.g. template rendering)."""
+    version, text = get_snapshot_json(name, version)
+    cached = _parsed.get(name)
+    if cached and cached[0] == version:
+        return cached[1]
+    data = json.loads(text)
+    _parsed[name] = (version, data)
+    return data
+
+
+def _drop_local_snapshots():
+    with _local_lock:
+        _local.clear()
+        _parsed.clear()
+
+
+def _listen_once():
+    pubsub = get_redis(PUBSUB).pubsub()
+    try:
+        pubsub.subscribe(CATALOG_CHANNEL)
+        # bumps published while we were not subscribed are lost: start from Redis
+        _state["version"] = int(r.get(CATALOG_VERSION_KEY) or 0)
+        _drop_local_snapshots()
+        _state["listening"] = True
+        for msg in pubsub.listen():
+            if msg and msg.get("type") == "message":
+                data = json.loads(msg["data"])
+                _state["version"] = max(int(data.get("version", 0)), _state["version"] or 0)
+    finally:
+        _state["listening"] = False
+        pubsub.close()
+
+
+def listen_catalog_version_changes():
+    """
+    Keep this worker's catalog version current from the pub/sub channel.
+    On a lost connection, get_catalog_version() falls back to reading Redis
+    until the listener has resubscribed (with backoff).
+    """
+    backoff = RECONNECT_BACKOFF
+    while True:
+        started = time.time()
+        try:
+            _listen_once()
+        except (redis.ConnectionError, redis.TimeoutError):
+            logger.warning("Catalog version listener lost its connection; resubscribing", exc_info=True)
+        except Exception:
+            logger.exception("Catalog version listener failed; resubscribing")
+        if time.time() - started > RECONNECT_BACKOFF_MAX:
+            backoff = RECONNECT_BACKOFF   # it had been running fine; this is a fresh failure
+        time.sleep(backoff)
+        backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+
+
+def start_catalog_listener():
+    """Start the version listener in a daemon thread (once per worker)."""
+    if _state["started"]:
+        return
+    _state["started"] = True
+    thread = threading.Thread(target=listen_catalog_version_changes, daemon=True, name="catalog-listener")
+    thread.start()
+
+
+# ---------------------- Automatic invalidation ----------------------
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[_DIRTY_KEY] = True
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(FoodItem, _event_name, _mark_dirty)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        try:
+            bump_catalog_version()
+        except Exception:
+            logger.exception("Failed to bump catalog version")
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_dirty(session):
+    session.info.pop(_DIRTY_KEY, None)
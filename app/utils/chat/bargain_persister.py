@@ -0,0 +1,186 @@
+"""
+Write-behind persistence of bargain messages.
+
+Socket handlers only XADD the row to the bargain:persist stream. A
+background persister reads it through a consumer group in batches,
+bulk-inserts into bargain_messages, and acknowledges the batch after the
+commit. Rows are keyed by (order_id, sequence_id), so a batch that is
+redelivered after a crash or a failed commit never inserts twice.
+Entries that keep failing end up in a dead-letter stream.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from datetime import datetime
+from redis.exceptions import ResponseError
+from app.extensions import r, db
+from app.merchants.Database.notifications import BargainMessage
+from app.utils.metrics import Counters, register_metrics
+
+logger = logging.getLogger(__name__)
+
+PERSIST_STREAM = "bargain:persist"
+PERSIST_GROUP = "bargain-persisters"
+DEAD_LETTER_STREAM = "bargain:persist_dead"
+
+STREAM_MAXLEN = 100000
+BATCH_SIZE = 200
+BLOCK_MS = 1000           # how long one read waits for new entries
+RETRY_IDLE_MS = 30000     # unacknowledged entries are retried after this long
+MAX_ATTEMPTS = 5          # deliveries before an entry is dead-lettered
+ERROR_BACKOFF = 5         # seconds to sleep after a failed batch
+
+persist_counters = Counters()
+register_metrics("bargain_persist", lambda: persist_counters.snapshot().get("bargain_messages", {}))
+
+_state = {"started": False, "group_ready": False}
+_state_lock = threading.Lock()
+
+
+def queue_bargain_message(order_id, sender_id, recipient_id, message, sequence_id, meta=None, client=None):
+    """
+    Queue one BargainMessage row for the persister. One Redis call, no DB;
+    pass a pipeline as `client` to batch it with other writes.
+    """
+    row = {
+        "order_id": str(order_id),
+        "sender_id": sender_id,
+        "recipient_id": recipient_id,
+        "message": message,
+        "meta": meta,
+        "sequence_id": int(sequence_id),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    return (client or r).xadd(PERSIST_STREAM, {"row": json.dumps(row)}, maxlen=STREAM_MAXLEN, approximate=True)
+
+
+def _ensure_group():
+    if _state["group_ready"]:
+        return
+    try:
+        r.xgroup_create(PERSIST_STREAM, PERSIST_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    _state["group_ready"] = True
+
+
+def _dead_letter(entries):
+    pipe = r.pipeline()
+    for entry_id, fields in entries:
+        pipe.xadd(DEAD_LETTER_STREAM, dict(fields, source_id=entry_id), maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.xack(PERSIST_STREAM, PERSIST_GROUP, entry_id)
+    pipe.execute()
+    persist_counters.incr("bargain_messages", "dead_lettered", len(entries))
+    logger.error("Dead-lettered %s bargain messages after %s attempts", len(entries), MAX_ATTEMPTS)
+
+
+def _claim_retries(consumer, batch_size):
+    """Entries another (or this) consumer failed to acknowledge in time, minus exhausted ones."""
+    # [next_id, entries] on Redis 6.2, [next_id, entries, deleted_ids] on 7+
+    reply = r.xautoclaim(
+        PERSIST_STREAM, PERSIST_GROUP, consumer, min_idle_time=RETRY_IDLE_MS, start_id="0-0", count=batch_size
+    )
+    entries = [(entry_id, fields) for entry_id, fields in reply[1] if fields]
+    if not entries:
+        return []
+
+    pending = r.xpending_range(
+        PERSIST_STREAM, PERSIST_GROUP, min=entries[0][0], max=entries[-1][0], count=len(entries) * 2
+    )
+    attempts = {p["message_id"]: p["times_delivered"] for p in pending}
+    exhausted = [e for e in entries if attempts.get(e[0], 0) > MAX_ATTEMPTS]
+    if exhausted:
+        _dead_letter(exhausted)
+    persist_counters.incr("bargain_messages", "retried", len(entries) - len(exhausted))
+    return [e for e in entries if attempts.get(e[0], 0) <= MAX_ATTEMPTS]
+
+
+def _insert_new(rows):
+    """Insert rows whose (order_id, sequence_id) is not stored yet. Returns how many were inserted."""
+    unique = {}
+    for row in rows:
+        unique.setdefault((row["order_id"], row["sequence_id"]), row)
+
+    existing = set(
+        db.session.query(BargainMessage.order_id, BargainMessage.sequence_id)
+        .filter(BargainMessage.order_id.in_({key[0] for key in unique}))
+        .filter(BargainMessage.sequence_id.in_({key[1] for key in unique}))
+        .all()
+    )
+    new_rows = [
+        dict(row, created_at=datetime.fromisoformat(row["created_at"]))
+        for key, row in unique.items()
+        if key not in existing
+    ]
+    if new_rows:
+        db.session.bulk_insert_mappings(BargainMessage, new_rows)
+    db.session.commit()
+    return len(new_rows)
+
+
+def persist_batch(consumer, batch_size=BATCH_SIZE, block_ms=BLOCK_MS):
+    """
+    Write one batch: retries first, then new entries. Entries are acknowledged
+    only after their rows are committed; if the bulk insert fails the batch
+    is retried row by row, and rows that still fail stay pending until
+    RETRY_IDLE_MS passes. Returns the number of entries handled.
+    """
+    _ensure_group()
+    entries = _claim_retries(consumer, batch_size)
+    if len(entries) < batch_size:
+        response = r.xreadgroup(
+            PERSIST_GROUP, consumer, {PERSIST_STREAM: ">"}, count=batch_size - len(entries), block=block_ms
+        )
+        for _, stream_entries in response or []:
+            entries.extend(stream_entries)
+    if not entries:
+        return 0
+
+    rows = [json.loads(fields["row"]) for _, fields in entries]
+    acked = [entry_id for entry_id, _ in entries]
+    try:
+        inserted = _insert_new(rows)
+    except Exception:
+        db.session.rollback()
+        persist_counters.incr("bargain_messages", "failed_batches")
+        logger.exception("Bulk insert of %s bargain messages failed; retrying row by row", len(rows))
+        # isolate the bad rows so they cannot hold back the rest of the batch
+        inserted, acked = 0, []
+        for (entry_id, _), row in zip(entries, rows):
+            try:
+                inserted += _insert_new([row])
+                acked.append(entry_id)
+            except Exception:
+                db.session.rollback()
+                persist_counters.incr("bargain_messages", "failed_rows")
+
+    if acked:
+        r.xack(PERSIST_STREAM, PERSIST_GROUP, *acked)
+    persist_counters.incr("bargain_messages", "inserted", inserted)
+    persist_counters.incr("bargain_messages", "duplicates", len(acked) - inserted)
+    return len(entries)
+
+
+def _persist_loop(app, consumer):
+    while True:
+        try:
+            with app.app_context():
+                persist_batch(consumer)
+        except Exception:
+            logger.exception("Bargain message batch failed; will retry")
+            time.sleep(ERROR_BACKOFF)
+
+
+def start_bargain_persister(app):
+    """Start the persister in a daemon thread (once per worker)."""
+    with _state_lock:
+        if _state["started"]:
+            return
+        _state["started"] = True
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    thread = threading.Thread(target=_persist_loop, args=(app, consumer), daemon=True, name="bargain-persister")
+    thread.start()
@@ -0,0 +1,72 @@
+"""
+Append-only message logs on Redis Streams (chat rooms, bargain threads).
+
+Each entry gets a stream id from XADD and a per-log sequence number from
+INCR, both assigned in one Lua call, so ordering is exact under
+concurrency and survives trimming. Clients remember the last id they saw
+and ask only for what came after it.
+"""
+import json
+from app.utils.redis_factory import get_redis, CHAT
+
+r = get_redis(CHAT)
+
+DEFAULT_MAXLEN = 500
+DEFAULT_HISTORY = 100
+
+# KEYS: stream, sequence counter   ARGV: maxlen, json payload, ttl (0 = keep), channel ("" = none)
+# -> {stream id, sequence number}
+# The published message wraps the payload untouched: {"id", "seq", "message": <payload>}
+_APPEND_LUA = """
+local seq = redis.call('INCR', KEYS[2])
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'seq', seq, 'data', ARGV[2])
+local ttl = tonumber(ARGV[3])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+end
+if ARGV[4] ~= '' then
+    redis.call('PUBLISH', ARGV[4], '{"id":"' .. id .. '","seq":' .. seq .. ',"message":' .. ARGV[2] .. '}')
+end
+return {id, seq}
+"""
+
+_append_script = r.register_script(_APPEND_LUA)
+
+
+def append_message(stream_key, seq_key, msg, maxlen=DEFAULT_MAXLEN, ttl=0, publish_channel=None):
+    """
+    Append `msg` (a JSON-serializable dict) to a log, and optionally PUBLISH
+    it on `publish_channel`, all in one round trip.
+    Returns (stream_id, seq); the caller should put both on what it broadcasts.
+    """
+    stream_id, seq = _append_script(
+        keys=[stream_key, seq_key], args=[maxlen, json.dumps(msg), ttl, publish_channel or ""]
+    )
+    return stream_id, int(seq)
+
+
+def _decode(entries):
+    messages = []
+    for stream_id, fields in entries:
+        msg = json.loads(fields["data"])
+        msg["id"] = stream_id
+        msg["seq"] = int(fields["seq"])
+        messages.append(msg)
+    return messages
+
+
+def read_since(stream_key, last_id=None, limit=DEFAULT_HISTORY):
+    """
+    Messages after `last_id`, oldest first, at most `limit` of them.
+    Without last_id, the latest `limit` messages. Returns (messages, has_more):
+    has_more means the client should ask again from the last returned id.
+    """
+    if last_id:
+        entries = r.xrange(stream_key, min=f"({last_id}", max="+", count=limit + 1)
+        has_more = len(entries) > limit
+        return _decode(entries[:limit]), has_more
+
+    entries = r.xrevrange(stream_key, max="+", min="-", count=limit)
+    entries.reverse()
+    return _decode(entries), False
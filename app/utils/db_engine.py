@@ -0,0 +1,108 @@
+"""
+The process-wide SQLAlchemy engine.
+
+Flask-SQLAlchemy (db.session, Model.query) and the scoped session returned
+by init_db() both run on the engine built here, so a worker holds exactly
+one connection pool per database URL. Pool sizing comes from config:
+
+    DB_POOL_SIZE       connections kept open
+    DB_MAX_OVERFLOW    extra connections opened under load, closed on return
+    DB_POOL_TIMEOUT    seconds a checkout waits before giving up
+    DB_POOL_RECYCLE    seconds after which a connection is replaced
+    DB_POOL_PRE_PING   test connections on checkout (survives DB restarts)
+
+Checkout waits, connections in use and overflow are exported under the
+"db_pool" metrics name.
+"""
+import time
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from config import Config
+from app.utils.metrics import PoolStats, register_metrics
+
+_engines = {}   # url -> engine
+_lock = threading.Lock()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout waits, connections in use and overflow."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats("db", self.size() + max(self._max_overflow, 0))
+        self.peak_overflow = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timed_out()
+            raise
+        self.stats.checked_out(time.perf_counter() - started)
+        self.peak_overflow = max(self.peak_overflow, self.overflow())
+        return record
+
+    def _do_return_conn(self, record):
+        self.stats.released()
+        super()._do_return_conn(record)
+
+    def recreate(self):
+        # SQLAlchemy recreates the pool after a disconnect; keep counting on the new one
+        pool = super().recreate()
+        pool.stats, pool.peak_overflow = self.stats, self.peak_overflow
+        return pool
+
+    def snapshot(self):
+        return dict(
+            self.stats.snapshot(),
+            pool_size=self.size(),
+            checked_in=self.checkedin(),
+            overflow=max(self.overflow(), 0),
+            peak_overflow=max(self.peak_overflow, 0),
+        )
+
+
+def engine_options(url):
+    """create_engine() keyword arguments for `url`, from config."""
+    options = {"pool_pre_ping": Config.DB_POOL_PRE_PING, "pool_recycle": Config.DB_POOL_RECYCLE}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options   # in-memory SQLite keeps its single-connection pool
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def get_engine(url=None):
+    """The shared engine for `url` (default SQLALCHEMY_DATABASE_URI), created on first use."""
+    url = str(url or Config.SQLALCHEMY_DATABASE_URI)
+    engine = _engines.get(url)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(url)
+            if engine is None:
+                engine = create_engine(url, **engine_options(url))
+                _engines[url] = engine
+    return engine
+
+
+def pool_metrics():
+    """Pool state of every engine opened so far, keyed by URL (password hidden)."""
+    with _lock:
+        engines = list(_engines.values())
+    return {
+        engine.url.render_as_string(hide_password=True): engine.pool.snapshot()
+        for engine in engines
+        if isinstance(engine.pool, InstrumentedQueuePool)
+    }
+
+
+register_metrics("db_pool", pool_metrics)
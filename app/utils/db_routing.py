@@ -0,0 +1,283 @@
+"""
+Read-replica routing for db.session.
+
+Views opt in, per route or per blueprint:
+
+    @bp.route("/things", methods=["GET"])
+    @replica_reads
+    def things(): ...
+
+    use_replica_for(store_bp)        # every GET/HEAD request of the blueprint
+
+Inside such a request, plain SELECTs go to a replica from DB_REPLICA_URLS.
+Writes, SELECT ... FOR UPDATE and anything issued while flushing still
+go to the primary. Everything else keeps using the primary, as do reads
+wrapped in primary_reads().
+
+A replica is only used while its measured lag is within DB_REPLICA_MAX_LAG.
+Lag is re-measured at most every DB_REPLICA_LAG_CHECK_INTERVAL seconds,
+and a replica that cannot be measured counts as lagging. When no replica
+qualifies, reads fall back to the primary.
+
+Read-your-writes: once a request commits a write, the writer reads from
+the primary for DB_READ_YOUR_WRITES_SECONDS. The writer is g.user when a
+token was verified, tracked in Redis so every worker sees it, or
+otherwise the browser session cookie.
+"""
+import time
+import random
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from flask import g, current_app, has_request_context, request, session as client_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from config import Config
+from app.utils.db_engine import get_engine
+from app.utils.metrics import Counters, register_metrics
+from app.utils.redis_factory import get_redis, SESSIONS
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ("GET", "HEAD")
+RECENT_WRITE_KEY = "db:recent_write:{user_id}"
+COOKIE_WRITE_KEY = "db_wrote_at"
+
+_WROTE = "routing_wrote"          # session.info flag: wrote since the last commit
+
+# seconds this replica is behind; 0 when fully replayed
+_PG_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+routing_counters = Counters()
+_lag = {}          # replica url -> (checked_at, lag seconds or None)
+_lag_lock = threading.Lock()
+
+
+def replica_reads(fn):
+    """Let the SELECTs of this view's GET/HEAD requests go to a replica."""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.db_read_replica = request.method in READ_METHODS
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def use_replica_for(blueprint, methods=READ_METHODS):
+    """Route the SELECTs of every `methods` request of `blueprint` to a replica."""
+
+    @blueprint.before_request
+    def _mark_read_only():
+        g.db_read_replica = request.method in methods
+
+    return blueprint
+
+
+@contextmanager
+def primary_reads():
+    """Send the SELECTs of this block to the primary, even inside a replica-routed request."""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get("db_read_replica")
+    g.db_read_replica = False
+    try:
+        yield
+    finally:
+        g.db_read_replica = previous
+
+
+# ---------------------- Replica health ----------------------
+def _measure_lag(engine):
+    if engine.dialect.name != "postgresql":
+        return 0.0   # no replication to measure (e.g. two SQLite files locally)
+    with engine.connect() as conn:
+        return float(conn.execute(_PG_LAG_SQL).scalar() or 0)
+
+
+def replica_lag(url):
+    """Lag of one replica in seconds (cached), or None when it could not be measured."""
+    now = time.monotonic()
+    checked_at, lag = _lag.get(url, (None, None))
+    if checked_at is not None and now - checked_at < Config.DB_REPLICA_LAG_CHECK_INTERVAL:
+        return lag
+    with _lag_lock:
+        checked_at, lag = _lag.get(url, (None, None))
+        if checked_at is not None and now - checked_at < Config.DB_REPLICA_LAG_CHECK_INTERVAL:
+            return lag
+        try:
+            lag = _measure_lag(get_engine(url))
+        except Exception:
+            logger.warning("Could not measure lag of replica %s", get_engine(url).url, exc_info=True)
+            lag = None
+        _lag[url] = (now, lag)
+    return lag
+
+
+def pick_replica():
+    """A random replica engine within DB_REPLICA_MAX_LAG, or None."""
+    urls = [url for url in Config.DB_REPLICA_URLS if _usable(replica_lag(url))]
+    if not urls:
+        if Config.DB_REPLICA_URLS:
+            routing_counters.incr("reads", "lag_fallbacks")
+        return None
+    return get_engine(random.choice(urls))
+
+
+def _usable(lag):
+    return lag is not None and lag <= Config.DB_REPLICA_MAX_LAG
+
+
+# ---------------------- Read-your-writes ----------------------
+def _user_id():
+    user = g.get("user")
+    return getattr(user, "id", None)
+
+
+def remember_write():
+    """Pin the current writer to the primary for DB_READ_YOUR_WRITES_SECONDS."""
+    if not has_request_context():
+        return
+    g.db_wrote = True
+    window = Config.DB_READ_YOUR_WRITES_SECONDS
+    user_id = _user_id()
+    try:
+        if user_id is not None:
+            get_redis(SESSIONS).setex(RECENT_WRITE_KEY.format(user_id=user_id), int(window), "1")
+        else:
+            client_session[COOKIE_WRITE_KEY] = time.time()
+    except Exception:
+        logger.warning("Could not record recent write; reads may briefly lag", exc_info=True)
+
+
+def _has_session_cookie():
+    # reading flask.session adds "Vary: Cookie", which would split the shared
+    # catalog cache per cookie; only touch it when the client sent one
+    return current_app.session_interface.get_cookie_name(current_app) in request.cookies
+
+
+def _recently_wrote():
+    """Whether this request's writer committed within the window. Checked once per request."""
+    if g.get("db_wrote"):
+        return True
+    sticky = g.get("db_sticky")
+    if sticky is None:
+        user_id = _user_id()
+        if user_id is not None:
+            try:
+                sticky = bool(get_redis(SESSIONS).exists(RECENT_WRITE_KEY.format(user_id=user_id)))
+            except Exception:
+                sticky = True   # cannot tell; the primary is always safe
+        elif _has_session_cookie():
+            wrote_at = client_session.get(COOKIE_WRITE_KEY) or 0
+            sticky = time.time() - wrote_at < Config.DB_READ_YOUR_WRITES_SECONDS
+        else:
+            sticky = False   # no session cookie, so no recent write to honor
+        g.db_sticky = sticky
+    return sticky
+
+
+# ---------------------- Session ----------------------
+def _is_plain_select(clause):
+    return (
+        clause is not None
+        and getattr(clause, "is_select", False)
+        and getattr(clause, "_for_update_arg", None) is None
+    )
+
+
+class RoutingSession(Session):
+    """db.session class that sends reads of opted-in requests to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info[_WROTE] = True
+        elif (
+            bind is None
+            and Config.DB_REPLICA_URLS
+            and has_request_context()
+            and g.get("db_read_replica")
+            and not self.info.get(_WROTE)
+            and _is_plain_select(clause)
+        ):
+            if _recently_wrote():
+                routing_counters.incr("reads", "sticky_primary")
+            else:
+                replica = pick_replica()
+                if replica is not None:
+                    routing_counters.incr("reads", "replica")
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    if session.info.pop(_WROTE, False):
+        remember_write()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_WROTE, None)
+
+
+def routing_metrics():
+    metrics = routing_counters.snapshot().get("reads", {})
+    metrics["replica_lag"] = {
+        get_engine(url).url.render_as_string(hide_password=True): _lag.get(url, (None, None))[1]
+        for url in Config.DB_REPLICA_URLS
+    }
+    return metrics
+
+
+register_metrics("db_routing", routing_metrics)
+
+
+if __name__ == "__main__":
+    # Local check with two SQLite files standing in for primary and replica:
+    #   python -m app.utils.db_routing
+    import os
+    import tempfile
+    from flask import Flask
+    from sqlalchemy import Column, Integer, String
+    from app.extensions import Base, db, init_db
+
+    class Probe(Base):
+        __tablename__ = "routing_probe"
+        id = Column(Integer, primary_key=True)
+        name = Column(String(32))
+
+    folder = tempfile.mkdtemp()
+    primary_url = f"sqlite:///{os.path.join(folder, 'primary.db')}"
+    replica_url = f"sqlite:///{os.path.join(folder, 'replica.db')}"
+    Config.SQLALCHEMY_DATABASE_URI = primary_url
+    Config.DB_REPLICA_URLS = [replica_url]
+    Probe.__table__.create(get_engine(primary_url))
+    Probe.__table__.create(get_engine(replica_url))
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["SQLALCHEMY_DATABASE_URI"] = primary_url
+    init_db(app)
+
+    @app.route("/probe", methods=["GET", "POST"])
+    @replica_reads
+    def probe():
+        if request.method == "POST":
+            db.session.add(Probe(name="written on primary"))
+            db.session.commit()
+        return str(db.session.query(Probe).count())
+
+    client = app.test_client()
+    print("GET before any write (replica)      ->", client.get("/probe").text)
+    print("POST writes to the primary          ->", client.post("/probe").text)
+    print("GET right after own write (primary) ->", client.get("/probe").text)
+    fresh = app.test_client()
+    print("GET from another client (replica)   ->", fresh.get("/probe").text)
+    from app.utils.metrics import collect_metrics
+    print(collect_metrics("db_routing"))
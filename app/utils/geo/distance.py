@@ -0,0 +1,18 @@
+"""Great-circle distances shared by the geo helpers and the rider location code."""
+import math
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres (haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres."""
+    return distance_m(lat1, lng1, lat2, lng2) / 1000.0
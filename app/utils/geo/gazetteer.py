@@ -0,0 +1,35 @@
+"""
+Offline reverse geocoder: nearest known place from a small gazetteer.
+Stands in for the network geocoder in development, tests and benchmarks
+(GEOCODER=offline); it has the same reverse(lat, lng) -> address|None shape.
+"""
+from app.utils.geo.distance import distance_km
+
+# (place, lat, lng)
+DEFAULT_PLACES = [
+    ("Yaba, Lagos, Nigeria", 6.5095, 3.3711),
+    ("Surulere, Lagos, Nigeria", 6.5005, 3.3581),
+    ("Ikeja, Lagos, Nigeria", 6.6018, 3.3515),
+    ("Ikoyi, Lagos, Nigeria", 6.4549, 3.4246),
+    ("Victoria Island, Lagos, Nigeria", 6.4281, 3.4219),
+    ("Lekki Phase 1, Lagos, Nigeria", 6.4478, 3.4723),
+    ("Ajah, Lagos, Nigeria", 6.4698, 3.5852),
+    ("Apapa, Lagos, Nigeria", 6.4553, 3.3641),
+    ("Maryland, Lagos, Nigeria", 6.5670, 3.3667),
+    ("Gbagada, Lagos, Nigeria", 6.5550, 3.3890),
+    ("Wuse, Abuja, Nigeria", 9.0765, 7.4786),
+    ("Garki, Abuja, Nigeria", 9.0415, 7.4893),
+]
+
+
+class OfflineGazetteer:
+    def __init__(self, places=DEFAULT_PLACES, max_km=5.0):
+        self.places = places
+        self.max_km = max_km
+
+    def reverse(self, lat, lng):
+        """Name of the nearest place within max_km, else None."""
+        best = min(self.places, key=lambda place: distance_km(lat, lng, place[1], place[2]), default=None)
+        if best is None or distance_km(lat, lng, best[1], best[2]) > self.max_km:
+            return None
+        return best[0]
@@ -0,0 +1,176 @@
+"""
+Cached reverse geocoding.
+
+Coordinates are snapped to a GEOCODE_GRID_DEGREES grid, so nearby pings
+share one lookup. Results are kept in a per-process LRU in front of Redis,
+"no address" answers are cached for a shorter time, and concurrent lookups
+of the same cell in one process wait for a single provider call.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from app.extensions import r
+from app.utils.geo.gazetteer import OfflineGazetteer
+from app.utils.metrics import Counters, register_metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_KEY = "geo:rev:{grid}:{cell_lat}:{cell_lng}"
+NOT_FOUND = ""  # cached marker for "the provider has no address here"
+
+GRID_DEGREES = Config.GEOCODE_GRID_DEGREES
+FOUND_TTL = 30 * 24 * 3600    # addresses barely change
+NOT_FOUND_TTL = 600           # retry empty answers after 10 minutes
+LOCAL_FOUND_TTL = 24 * 3600
+LOCAL_CACHE_SIZE = 5000
+LOOKUP_TIMEOUT = 10           # seconds a coalesced caller waits for the leader
+
+geocode_counters = Counters()
+register_metrics("geocode", lambda: geocode_counters.snapshot().get("reverse", {}))
+
+
+class NominatimGeocoder:
+    """geopy's Nominatim, imported on first use so the offline path needs no geopy."""
+
+    def __init__(self, user_agent=Config.GEOCODER_USER_AGENT, timeout=5):
+        from geopy.geocoders import Nominatim
+
+        self._client = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def reverse(self, lat, lng):
+        location = self._client.reverse(f"{lat}, {lng}", language="en")
+        return location.address if location else None
+
+
+_provider = {"instance": None}
+
+
+def get_geocoder():
+    """The configured provider: GEOCODER=offline uses the built-in gazetteer."""
+    if _provider["instance"] is None:
+        if Config.GEOCODER == "offline":
+            _provider["instance"] = OfflineGazetteer()
+        else:
+            _provider["instance"] = NominatimGeocoder()
+    return _provider["instance"]
+
+
+def quantize(lat, lng, grid=GRID_DEGREES):
+    """Integer grid cell for a coordinate pair."""
+    return round(float(lat) / grid), round(float(lng) / grid)
+
+
+class _LocalCache:
+    """Small LRU whose entries expire, so negative answers age out too."""
+
+    def __init__(self, maxsize=LOCAL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, address)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, address, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, address)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _Flight:
+    __slots__ = ("done", "address")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.address = None
+
+
+_local = _LocalCache()
+_inflight = {}  # cache key -> _Flight
+_inflight_lock = threading.Lock()
+
+
+def _lookup(key, cell_lat, cell_lng, grid):
+    """Redis, then the provider; stores the answer in both caches."""
+    cached = r.get(key)
+    if cached is not None:
+        geocode_counters.incr("reverse", "redis_hit")
+        _local.set(key, cached, LOCAL_FOUND_TTL if cached else NOT_FOUND_TTL)
+        return cached or None
+
+    geocode_counters.incr("reverse", "provider_call")
+    try:
+        # the cell centre, so every point in the cell gets the same answer
+        address = get_geocoder().reverse(cell_lat * grid, cell_lng * grid)
+    except Exception:
+        # provider errors (timeouts, rate limits) are not cached
+        logger.exception("Reverse geocoding failed for cell %s,%s", cell_lat, cell_lng)
+        geocode_counters.incr("reverse", "provider_error")
+        return None
+
+    if address:
+        r.setex(key, FOUND_TTL, address)
+        _local.set(key, address, LOCAL_FOUND_TTL)
+    else:
+        r.setex(key, NOT_FOUND_TTL, NOT_FOUND)
+        _local.set(key, NOT_FOUND, NOT_FOUND_TTL)
+    return address or None
+
+
+def reverse_geocode(lat, lng, grid=GRID_DEGREES):
+    """Address for a coordinate pair, or None when it cannot be resolved."""
+    cell_lat, cell_lng = quantize(lat, lng, grid)
+    key = GEOCODE_KEY.format(grid=grid, cell_lat=cell_lat, cell_lng=cell_lng)
+
+    entry = _local.get(key)
+    if entry is not None:
+        geocode_counters.incr("reverse", "local_hit")
+        return entry[1] or None
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        geocode_counters.incr("reverse", "coalesced")
+        flight.done.wait(LOOKUP_TIMEOUT)
+        return flight.address
+
+    try:
+        flight.address = _lookup(key, cell_lat, cell_lng, grid)
+        return flight.address
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+
+if __name__ == "__main__":
+    # Offline micro-benchmark: GEOCODER=offline python -m app.utils.geo.reverse_geocode
+    import random
+
+    random.seed(1)
+    lookups = 20000
+    started = time.perf_counter()
+    resolved = 0
+    for _ in range(lookups):
+        lat = 6.45 + random.random() * 0.15
+        lng = 3.35 + random.random() * 0.2
+        resolved += reverse_geocode(lat, lng) is not None
+    elapsed = time.perf_counter() - started
+    print(f"{lookups} lookups in {elapsed:.2f}s ({lookups / elapsed:.0f}/s), {resolved} resolved")
+    print(geocode_counters.snapshot().get("reverse", {}))
@@ -0,0 +1,36 @@
+import hashlib
+from flask import request, current_app
+
+# Shared catalog responses: browsers must revalidate every time (a 304 when
+# nothing changed). nginx may serve its stored copy for CATALOG_SHARED_MAX_AGE
+# seconds, then revalidates it the same way; max-age=0 alone would keep nginx
+# from storing anything.
+CATALOG_SHARED_MAX_AGE = 5
+CATALOG_CACHE_CONTROL = f"public, max-age=0, s-maxage={CATALOG_SHARED_MAX_AGE}, must-revalidate"
+
+
+def make_etag(*parts):
+    """Short, stable ETag value from version numbers, cache keys or content."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def not_modified(etag):
+    """True when the client's If-None-Match already names this ETag."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def conditional_response(etag, build_response, cache_control=CATALOG_CACHE_CONTROL):
+    """
+    Answer 304 when the client already has `etag`, otherwise call
+    build_response() and tag what it returns. The body is only built
+    (and serialized) when it actually has to be sent.
+    """
+    if not_modified(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build_response())
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,78 @@
+import threading
+from collections import defaultdict
+
+# name -> callable returning a JSON-serializable dict of current values
+_providers = {}
+
+
+def register_metrics(name, provider):
+    """Register a callable reporting metrics for one subsystem under `name`."""
+    _providers[name] = provider
+
+
+def collect_metrics(name=None):
+    """Snapshot of every registered subsystem, or just one when `name` is given."""
+    if name is not None:
+        provider = _providers.get(name)
+        return provider() if provider else None
+    return {key: provider() for key, provider in _providers.items()}
+
+
+class Counters:
+    """Thread-safe in-process counters, grouped by a label (e.g. a cache name)."""
+
+    def __init__(self):
+        self._values = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def incr(self, label, field, amount=1):
+        with self._lock:
+            self._values[label][field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {label: dict(fields) for label, fields in self._values.items()}
+
+
+class PoolStats:
+    """Checkout accounting for a connection pool: in-use, peak, waits and timeouts."""
+
+    def __init__(self, name, max_connections):
+        self.name = name
+        self.max_connections = max_connections
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def checked_out(self, waited):
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def released(self):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_connections": self.max_connections,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "utilization": round(self.in_use / self.max_connections, 3),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+            }
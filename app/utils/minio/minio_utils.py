@@ -1,27 +1,142 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
 from datetime import timedelta
 from app.extensions import init_minio
+from config import Config
+
+logger = logging.getLogger(__name__)
 
 MINIO_BUCKET = "gofood-images"
 
+# Presigned URL cache settings
+URL_EXPIRES = timedelta(seconds=Config.MINIO_URL_EXPIRES)
+URL_REFRESH_MARGIN = Config.MINIO_URL_REFRESH_MARGIN  # seconds before expiry a URL is re-signed
+URL_CACHE_SIZE = Config.MINIO_URL_CACHE_SIZE
+
+_client = None
+
+
+def get_minio_client():
+    """Return the process-wide MinIO client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = init_minio(Config)
+    return _client
+
+
+class PresignedUrlCache:
+    """
+    Bounded LRU of presigned GET URLs keyed by (bucket, object_name).
+    A URL is handed out until `refresh_margin` seconds before it expires,
+    so clients never receive a link that is about to stop working.
+    """
+
+    def __init__(self, maxsize=URL_CACHE_SIZE, refresh_margin=URL_REFRESH_MARGIN):
+        self.maxsize = maxsize
+        self.refresh_margin = refresh_margin
+        self._entries = OrderedDict()  # (bucket, object_name) -> (url, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bucket, object_name, min_valid=None):
+        """Cached URL still valid for max(refresh_margin, min_valid) seconds, or None."""
+        key = (bucket, object_name)
+        margin = max(self.refresh_margin, min_valid or 0)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            url, expires_at = entry
+            if expires_at - margin <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return url
+
+    def set(self, bucket, object_name, url, expires):
+        key = (bucket, object_name)
+        expires_at = time.time() + expires.total_seconds()
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bucket, object_name):
+        with self._lock:
+            self._entries.pop((bucket, object_name), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+url_cache = PresignedUrlCache()
+
+
 def upload_to_minio(vendor_name, file_bytes, filename, content_type):
     """
     Upload file bytes to MinIO and return its object name.
     """
     object_name = f"{vendor_name}/{filename}"
-    init_minio.put_object(
+    get_minio_client().put_object(
         bucket_name=MINIO_BUCKET,
         object_name=object_name,
         data=file_bytes,
         length=len(file_bytes),
         content_type=content_type,
     )
+    # an overwritten object keeps its name, so drop any URL signed for the old one
+    url_cache.invalidate(MINIO_BUCKET, object_name)
     return object_name
 
 
-def get_minio_file_url(vendor_name, filename, expires=timedelta(hours=1)):
+def get_minio_file_url(vendor_name, filename, expires=URL_EXPIRES, min_valid=None):
     """
     Return a presigned MinIO URL for an object.
+    Served from the URL cache while the cached signature is still fresh;
+    pass min_valid (seconds) when the URL will itself be cached for a while.
     """
     object_name = f"{vendor_name}/{filename}"
-    return init_minio.presigned_get_object(MINIO_BUCKET, object_name, expires=expires)
+    url = url_cache.get(MINIO_BUCKET, object_name, min_valid=min_valid)
+    if url:
+        return url
+
+    url = get_minio_client().presigned_get_object(MINIO_BUCKET, object_name, expires=expires)
+    url_cache.set(MINIO_BUCKET, object_name, url, expires)
+    return url
+
+
+def get_minio_file_urls(objects, expires=URL_EXPIRES, min_valid=None):
+    """
+    Batch version of get_minio_file_url for a whole page of items.
+    `objects` is a list of (vendor_name, filename) pairs; returns a list of
+    URLs in the same order, with None where the pair is incomplete or
+    signing failed. Each distinct object is signed at most once.
+    """
+    signed = {}
+    urls = []
+    for vendor_name, filename in objects:
+        if not vendor_name or not filename:
+            urls.append(None)
+            continue
 
+        key = (vendor_name, filename)
+        if key not in signed:
+            try:
+                signed[key] = get_minio_file_url(vendor_name, filename, expires=expires, min_valid=min_valid)
+            except Exception as e:
+                logger.warning("[MINIO ERROR] %s/%s: %s", vendor_name, filename, e)
+                signed[key] = None
+        urls.append(signed[key])
+    return urls
@@ -0,0 +1,314 @@
+"""
+Batched notification delivery.
+
+The outbox relay queues each notification for its recipient on every
+channel. Delivery is not sent right away. The recipient becomes due
+NOTIFY_DIGEST_WINDOW seconds after their first pending notification, and
+everything queued for them by then goes out as one message: the usual
+text for a single order, a digest for several.
+
+Redis layout, per channel:
+    notify:pending:{channel}:{recipient}   LIST of notification JSON
+    notify:due:{channel}                   ZSET recipient -> due time
+    notify:attempts:{channel}              HASH recipient -> consecutive failed sends
+    notify:failed:{channel}                LIST of batches that ran out of attempts
+
+Each worker runs one dispatcher thread. Taking a recipient's queue is a
+single Lua call, so several workers never send the same notification.
+Sends respect a per-channel rate limit shared by all workers, and reuse
+one SMTP connection and one Twilio client. A failed send puts the batch
+back and retries with backoff. After MAX_ATTEMPTS consecutive failures
+for a recipient (an invalid number, a rejected address) the batch goes
+to notify:failed:{channel} instead. One recipient's failure never holds
+up the rest of the pass: batches taken but not yet attempted when a pass
+fails (the contact lookup, Redis) are put back without counting an
+attempt. Queue depth is read from the pending lists themselves, so
+lists that expire never leave a stale count behind.
+
+Delivery from here is at most once: a taken batch lives only in the
+worker's memory until it is sent or requeued, so a worker that dies in
+between loses it. The outbox has already marked those events
+dispatched, and the vendor still received the Socket.IO notification
+and sees the order on their dashboard.
+"""
+import json
+import time
+import logging
+import threading
+from app.extensions import db, r
+from app.merchants.Database.vendors_data_base import Profile_Merchant
+from app.database.user_models import User
+from app.utils.metrics import Counters, register_metrics
+from app.utils.notifications.senders import EmailSender, WhatsAppSender
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+EMAIL = "email"
+WHATSAPP = "whatsapp"
+CHANNELS = (EMAIL, WHATSAPP)
+
+PENDING_KEY = "notify:pending:{channel}:{recipient_id}"
+DUE_KEY = "notify:due:{channel}"
+RATE_KEY = "notify:rate:{channel}:{second}"
+ATTEMPTS_KEY = "notify:attempts:{channel}"               # HASH recipient -> consecutive failures
+FAILED_KEY = "notify:failed:{channel}"
+
+PENDING_TTL = 24 * 3600
+MAX_PER_MESSAGE = 50       # notifications folded into one digest at most
+RECIPIENTS_PER_PASS = 100
+RETRY_BASE = 10            # seconds; doubles per failed attempt of a recipient
+RETRY_MAX = 600
+MAX_ATTEMPTS = 8           # consecutive failed sends before a batch is parked in FAILED_KEY
+FAILED_MAXLEN = 1000
+ERROR_BACKOFF = 5
+
+# KEYS: pending list, due zset   ARGV: recipient, max items
+# -> the taken items; the recipient leaves the due set once its list is empty
+_TAKE_LUA = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[2]) - 1)
+if #items == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return items
+end
+redis.call('LTRIM', KEYS[1], #items, -1)
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return items
+"""
+
+_take_script = r.register_script(_TAKE_LUA)
+
+dispatch_counters = Counters()
+_senders = {EMAIL: EmailSender(), WHATSAPP: WhatsAppSender()}
+_state = {"started": False}
+_state_lock = threading.Lock()
+
+
+def queue_notification(recipient_id, notification, channels=CHANNELS, client=None):
+    """
+    Queue a notification dict (Notification.to_dict(), plus event_key) for
+    delivery to vendor `recipient_id`. Pass a pipeline as `client` to batch it.
+    """
+    pipe = client or r.pipeline(transaction=False)
+    due_at = time.time() + Config.NOTIFY_DIGEST_WINDOW
+    data = json.dumps(notification)
+    for channel in channels:
+        key = PENDING_KEY.format(channel=channel, recipient_id=recipient_id)
+        pipe.rpush(key, data)
+        pipe.expire(key, PENDING_TTL)
+        pipe.zadd(DUE_KEY.format(channel=channel), {recipient_id: due_at}, nx=True)
+        dispatch_counters.incr(channel, "queued")
+    if client is None:
+        pipe.execute()
+
+
+# ---------------------- Rendering ----------------------
+def _dedupe(items):
+    seen, unique = set(), []
+    for item in items:
+        key = item.get("event_key") or item.get("id")
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique
+
+
+def render(notifications):
+    """(subject, body) for one recipient's batch."""
+    if len(notifications) == 1:
+        n = notifications[0]
+        return (
+            f"New Order #{n['order_id']}",
+            f"You have a new order (ID {n['order_id']}). Please check your dashboard.",
+        )
+    orders = ", ".join(f"#{n['order_id']}" for n in notifications)
+    return (
+        f"{len(notifications)} new orders",
+        f"You have {len(notifications)} new orders ({orders}). Please check your dashboard.",
+    )
+
+
+# ---------------------- Delivery ----------------------
+def _contacts(vendor_ids):
+    """vendor id -> (email, phone) of its merchant account, in one query."""
+    rows = (
+        db.session.query(Profile_Merchant.vendor_id, User.email, User.phone)
+        .join(User, User.id == Profile_Merchant.user_id)
+        .filter(Profile_Merchant.vendor_id.in_(vendor_ids))
+        .order_by(Profile_Merchant.id)
+        .all()
+    )
+    contacts = {}
+    for vendor_id, email, phone in rows:
+        contacts.setdefault(vendor_id, (email, phone))
+    return contacts
+
+
+def _acquire(channel):
+    """Block until the channel's shared per-second budget allows one more send."""
+    limit = Config.NOTIFY_RATE_LIMITS.get(channel)
+    if not limit:
+        return
+    while True:
+        now = time.time()
+        key = RATE_KEY.format(channel=channel, second=int(now))
+        pipe = r.pipeline(transaction=False)
+        pipe.incr(key)
+        pipe.expire(key, 2)
+        used, _ = pipe.execute()
+        if used <= limit:
+            return
+        dispatch_counters.incr(channel, "rate_limited")
+        time.sleep(max(int(now) + 1 - now, 0.01))
+
+
+def _requeue(channel, recipient_id, raw_items, count_attempt=True):
+    """
+    Put a failed batch back with backoff, or park it in FAILED_KEY after
+    MAX_ATTEMPTS failed sends. count_attempt=False for failures that are
+    not the recipient's fault (the contact lookup).
+    """
+    attempts_key = ATTEMPTS_KEY.format(channel=channel)
+    failures = r.hincrby(attempts_key, recipient_id, 1) if count_attempt else 1
+    pipe = r.pipeline(transaction=False)
+    if failures >= MAX_ATTEMPTS:
+        failed_key = FAILED_KEY.format(channel=channel)
+        pipe.lpush(failed_key, json.dumps({
+            "recipient_id": recipient_id,
+            "items": [json.loads(item) for item in raw_items],
+            "failed_at": time.time(),
+        }))
+        pipe.ltrim(failed_key, 0, FAILED_MAXLEN - 1)
+        pipe.hdel(attempts_key, recipient_id)
+        pipe.execute()
+        dispatch_counters.incr(channel, "dead", len(raw_items))
+        logger.error("Gave up sending %s to vendor %s after %s attempts", channel, recipient_id, failures)
+        return
+    retry_at = time.time() + min(RETRY_BASE * 2 ** (failures - 1), RETRY_MAX)
+    pipe.lpush(PENDING_KEY.format(channel=channel, recipient_id=recipient_id), *reversed(raw_items))
+    pipe.zadd(DUE_KEY.format(channel=channel), {recipient_id: retry_at})
+    pipe.execute()
+    dispatch_counters.incr(channel, "requeued", len(raw_items))
+
+
+def dispatch_channel(channel, now=None):
+    """Send every due batch of one channel. Returns how many messages were sent."""
+    now = now or time.time()
+    due_key = DUE_KEY.format(channel=channel)
+    recipients = r.zrangebyscore(due_key, "-inf", now, start=0, num=RECIPIENTS_PER_PASS)
+    if not recipients:
+        return 0
+
+    pipe = r.pipeline(transaction=False)
+    for recipient_id in recipients:
+        _take_script(
+            keys=[PENDING_KEY.format(channel=channel, recipient_id=recipient_id), due_key],
+            args=[recipient_id, MAX_PER_MESSAGE],
+            client=pipe,
+        )
+    batches = {int(rid): items for rid, items in zip(recipients, pipe.execute()) if items}
+    if not batches:
+        return 0
+
+    # `batches` holds what was taken and is not yet sent or requeued; whatever
+    # is left when the pass ends, however it ends, goes back to Redis
+    sender = _senders[channel]
+    sent = 0
+    succeeded = []
+    try:
+        contacts = _contacts(list(batches))
+        for recipient_id, raw_items in list(batches.items()):
+            try:
+                notifications = _dedupe([json.loads(item) for item in raw_items])
+                email, phone = contacts.get(recipient_id, (None, None))
+                address = email if channel == EMAIL else phone
+                if not address:
+                    del batches[recipient_id]
+                    dispatch_counters.incr(channel, "no_address", len(notifications))
+                    continue
+                subject, body = render(notifications)
+                _acquire(channel)
+                try:
+                    sender.send(address, subject, body)
+                except Exception:
+                    logger.warning("Sending %s to vendor %s failed; will retry", channel, recipient_id, exc_info=True)
+                    dispatch_counters.incr(channel, "failed")
+                    _requeue(channel, recipient_id, raw_items)
+                    del batches[recipient_id]
+                    continue
+                del batches[recipient_id]
+            except Exception:
+                logger.exception("Dispatching %s to vendor %s failed; will retry", channel, recipient_id)
+                continue
+            succeeded.append(recipient_id)
+            sent += 1
+            dispatch_counters.incr(channel, "messages")
+            dispatch_counters.incr(channel, "notifications", len(notifications))
+            dispatch_counters.incr(channel, "duplicates", len(raw_items) - len(notifications))
+            if len(notifications) > 1:
+                dispatch_counters.incr(channel, "digests")
+    finally:
+        for recipient_id, raw_items in batches.items():
+            try:
+                _requeue(channel, recipient_id, raw_items, count_attempt=False)
+            except Exception:
+                dispatch_counters.incr(channel, "lost", len(raw_items))
+                logger.exception("Could not requeue %s for vendor %s", channel, recipient_id)
+        if succeeded:
+            r.hdel(ATTEMPTS_KEY.format(channel=channel), *succeeded)
+    return sent
+
+
+def _dispatch_loop(app):
+    while True:
+        try:
+            with app.app_context():
+                for channel in CHANNELS:
+                    dispatch_channel(channel)
+            time.sleep(Config.NOTIFY_TICK)
+        except Exception:
+            logger.exception("Notification dispatch failed; will retry")
+            time.sleep(ERROR_BACKOFF)
+
+
+def start_notification_dispatcher(app):
+    """Start the dispatcher in a daemon thread (once per worker)."""
+    with _state_lock:
+        if _state["started"]:
+            return
+        _state["started"] = True
+    thread = threading.Thread(target=_dispatch_loop, args=(app,), daemon=True, name="notification-dispatcher")
+    thread.start()
+
+
+def dispatch_metrics():
+    """Throughput counters per channel, plus queue depth and the oldest due wait."""
+    metrics = dispatch_counters.snapshot()
+    pipe = r.pipeline(transaction=False)
+    for channel in CHANNELS:
+        pipe.zrange(DUE_KEY.format(channel=channel), 0, -1)
+        pipe.zrange(DUE_KEY.format(channel=channel), 0, 0, withscores=True)
+        pipe.llen(FAILED_KEY.format(channel=channel))
+    results = pipe.execute()
+    # every queued notification sits in the pending list of a due recipient
+    pipe = r.pipeline(transaction=False)
+    for i, channel in enumerate(CHANNELS):
+        for recipient_id in results[3 * i]:
+            pipe.llen(PENDING_KEY.format(channel=channel, recipient_id=recipient_id))
+    lengths = iter(pipe.execute())
+    now = time.time()
+    for i, channel in enumerate(CHANNELS):
+        oldest = results[3 * i + 1]
+        metrics.setdefault(channel, {}).update(
+            queue_depth=sum(next(lengths) for _ in results[3 * i]),
+            recipients_waiting=len(results[3 * i]),
+            oldest_overdue_s=round(max(now - oldest[0][1], 0), 1) if oldest else 0,
+            failed_kept=results[3 * i + 2],
+        )
+    return metrics
+
+
+register_metrics("notifications", dispatch_metrics)
@@ -0,0 +1,195 @@
+"""
+Transactional outbox for order notifications.
+
+Handlers call add_notifications() before their single commit, so the
+order, its Notification rows and their outbox events are stored together
+or not at all. Nothing is published from the request.
+
+A relay thread per worker drains notification_outbox in batches. For each
+batch it sends one Redis pipeline that PUBLISHes every event on
+"notifications" and queues it for the email and WhatsApp dispatcher
+(app/utils/notifications/dispatcher.py). Then each event gets a Socket.IO
+"new_notification" to the vendor's room. An event is marked dispatched
+only after its fan-out succeeds. Failures retry with exponential backoff
+until MAX_ATTEMPTS.
+
+Dedupe: relayed events are remembered in Redis under their event_key. If
+the fan-out went out but marking the row failed, the next pass marks the
+row without sending again. Consumers also receive the event_key and can
+drop repeats. Rows are locked with SKIP LOCKED, so several workers can
+relay at once.
+"""
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from app.extensions import db, socketio
+from app.merchants.Database.notifications import NotificationOutbox
+from app.utils.metrics import Counters, register_metrics
+from app.utils.redis_batch import redis_batch
+from app.utils.notifications.dispatcher import queue_notification
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_CHANNEL = "notifications"
+VENDOR_NAMESPACE = "/vendor"
+VENDOR_ROOM = "vendor_{vendor_id}"
+RELAYED_KEY = "outbox:relayed:{event_key}"
+
+RELAYED_TTL = 7 * 24 * 3600
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 10
+RETRY_BASE = 5            # seconds; doubles per attempt
+RETRY_MAX = 300
+RETENTION = timedelta(days=7)
+PURGE_EVERY = 600         # seconds between deletes of old dispatched rows
+ERROR_BACKOFF = 5
+
+outbox_counters = Counters()
+register_metrics("outbox", lambda: outbox_counters.snapshot().get("notifications", {}))
+
+_state = {"started": False, "purged_at": 0.0}
+_state_lock = threading.Lock()
+
+
+def notification_event_key(notification):
+    return f"notification:{notification.id}"
+
+
+def add_notifications(notifications, session=None):
+    """
+    Stage outbox events for `notifications` in the current transaction.
+    Flushes to assign notification ids; the caller commits.
+    """
+    session = session or db.session
+    session.flush()
+    rows = [
+        NotificationOutbox(event_key=notification_event_key(n), payload=n.to_dict())
+        for n in notifications
+    ]
+    session.add_all(rows)
+    return rows
+
+
+def _pending(batch_size):
+    now = datetime.utcnow()
+    return (
+        db.session.query(NotificationOutbox)
+        .filter(NotificationOutbox.dispatched_at.is_(None))
+        .filter(NotificationOutbox.attempts < MAX_ATTEMPTS)
+        .filter(NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def _fan_out(row):
+    payload = dict(row.payload, event_key=row.event_key)
+    socketio.emit(
+        "new_notification", payload,
+        room=VENDOR_ROOM.format(vendor_id=payload["user_id"]), namespace=VENDOR_NAMESPACE,
+    )
+
+
+def _failed(row, error):
+    row.attempts += 1
+    row.last_error = str(error)[:512]
+    row.next_attempt_at = datetime.utcnow() + timedelta(seconds=min(RETRY_BASE * 2 ** (row.attempts - 1), RETRY_MAX))
+    outbox_counters.incr("notifications", "failed")
+    if row.attempts >= MAX_ATTEMPTS:
+        outbox_counters.incr("notifications", "dead")
+        logger.error("Outbox event %s gave up after %s attempts: %s", row.event_key, row.attempts, row.last_error)
+
+
+def relay_batch(batch_size=BATCH_SIZE):
+    """Relay one batch of due events. Returns how many rows were handled."""
+    rows = _pending(batch_size)
+    if not rows:
+        db.session.commit()
+        return 0
+
+    now = datetime.utcnow()
+    keys = [RELAYED_KEY.format(event_key=row.event_key) for row in rows]
+    lookup = redis_batch()
+    with lookup as pipe:
+        for key in keys:
+            pipe.exists(key)
+    already = [bool(flag) for flag in lookup.results]
+
+    fresh = [row for row, seen in zip(rows, already) if not seen]
+    for row, seen in zip(rows, already):
+        if seen:
+            row.dispatched_at = now
+    outbox_counters.incr("notifications", "duplicates", len(rows) - len(fresh))
+
+    sent = []
+    try:
+        with redis_batch() as pipe:
+            for row in fresh:
+                payload = dict(row.payload, event_key=row.event_key)
+                pipe.publish(NOTIFICATION_CHANNEL, json.dumps(payload))
+                queue_notification(payload["user_id"], payload, client=pipe)
+    except Exception as e:
+        logger.exception("Publishing %s outbox events failed", len(fresh))
+        for row in fresh:
+            _failed(row, e)
+        fresh = []
+
+    for row in fresh:
+        try:
+            _fan_out(row)
+        except Exception as e:
+            logger.warning("Fan-out of outbox event %s failed", row.event_key, exc_info=True)
+            _failed(row, e)
+            continue
+        row.dispatched_at = now
+        sent.append(row)
+
+    if sent:
+        with redis_batch() as pipe:
+            for row in sent:
+                pipe.set(RELAYED_KEY.format(event_key=row.event_key), "1", ex=RELAYED_TTL, nx=True)
+    db.session.commit()
+    outbox_counters.incr("notifications", "relayed", len(sent))
+    return len(rows)
+
+
+def purge_dispatched(older_than=RETENTION):
+    """Delete dispatched rows older than `older_than`. Returns how many were deleted."""
+    cutoff = datetime.utcnow() - older_than
+    deleted = (
+        db.session.query(NotificationOutbox)
+        .filter(NotificationOutbox.dispatched_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
+
+
+def _relay_loop(app):
+    while True:
+        try:
+            with app.app_context():
+                handled = relay_batch()
+                if time.time() - _state["purged_at"] > PURGE_EVERY:
+                    purge_dispatched()
+                    _state["purged_at"] = time.time()
+            if not handled:
+                time.sleep(Config.OUTBOX_POLL_INTERVAL)
+        except Exception:
+            logger.exception("Outbox relay failed; will retry")
+            time.sleep(ERROR_BACKOFF)
+
+
+def start_outbox_relay(app):
+    """Start the relay in a daemon thread (once per worker)."""
+    with _state_lock:
+        if _state["started"]:
+            return
+        _state["started"] = True
+    thread = threading.Thread(target=_relay_loop, args=(app,), daemon=True, name="outbox-relay")
+    thread.start()
@@ -0,0 +1,91 @@
+"""
+Long-lived channel senders for the notification dispatcher.
+
+One instance per channel per worker. The SMTP connection and the Twilio
+client (and its keep-alive HTTP session) are opened on first use and
+reused by every later send. A dropped connection is reopened once before
+the error is reported.
+"""
+import time
+import smtplib
+import logging
+import threading
+from email.message import EmailMessage
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SMTP_IDLE_CHECK = 60      # seconds idle before the SMTP connection is NOOP-checked
+
+
+class EmailSender:
+    """Sends over one persistent, authenticated SMTP connection."""
+
+    def __init__(self):
+        self._smtp = None
+        self._used_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT, timeout=30)
+        if Config.MAIL_USE_TLS:
+            smtp.starttls()
+        if Config.MAIL_USERNAME:
+            smtp.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
+        return smtp
+
+    def _connection(self):
+        if self._smtp is not None and time.monotonic() - self._used_at > SMTP_IDLE_CHECK:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def send(self, to, subject, body):
+        message = EmailMessage()
+        message["From"] = Config.NOTIFY_EMAIL_FROM
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        with self._lock:
+            try:
+                self._connection().send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.close()
+                self._connection().send_message(message)
+            self._used_at = time.monotonic()
+
+    def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+
+
+class WhatsAppSender:
+    """Sends WhatsApp messages through one Twilio client (one pooled HTTP session)."""
+
+    def __init__(self):
+        self._client = None
+
+    def _connection(self):
+        if self._client is None:
+            from twilio.rest import Client
+            self._client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
+        return self._client
+
+    def send(self, to, subject, body):
+        self._connection().messages.create(
+            from_=Config.TWILIO_WHATSAPP_FROM,
+            to=f"whatsapp:{to}",
+            body=body,
+        )
+
+    def close(self):
+        self._client = None
@@ -0,0 +1,111 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.extensions import r
+
+COUNT_CACHE_TTL = 60  # seconds a cached total stays valid
+
+
+def encode_cursor(data):
+    """Encode cursor values as an opaque, URL-safe token."""
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Decode a token from encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(data, dict):
+        raise ValueError("Invalid cursor")
+    return data
+
+
+def wants_cursor_pagination(args):
+    """Cursor mode is opt-in (?cursor=... or ?paginate=cursor); offset mode stays the default."""
+    return "cursor" in args or args.get("paginate") == "cursor"
+
+
+def keyset_paginate(query, created_col, id_col, limit, cursor=None):
+    """
+    Newest-first keyset pagination on (created_at, id); rows with no
+    created_at sort last.
+    `cursor` is a token from a previous page's next_cursor/prev_cursor.
+    Returns (rows, next_cursor, prev_cursor); a cursor is None when there is
+    no page in that direction.
+    Raises ValueError for a malformed cursor.
+    """
+    direction = "next"
+    if cursor:
+        data = decode_cursor(cursor)
+        direction = data.get("d", "next")
+        try:
+            created_at = datetime.fromisoformat(data["c"]) if data["c"] is not None else None
+            row_id = int(data["i"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        if direction not in ("next", "prev"):
+            raise ValueError("Invalid cursor")
+
+        if created_at is None:
+            # cursor inside the trailing NULL block: only NULL rows follow it
+            if direction == "prev":
+                query = query.filter(or_(
+                    created_col.isnot(None),
+                    and_(created_col.is_(None), id_col > row_id),
+                ))
+            else:
+                query = query.filter(created_col.is_(None), id_col < row_id)
+        elif direction == "prev":
+            query = query.filter(or_(
+                created_col > created_at,
+                and_(created_col == created_at, id_col > row_id),
+            ))
+        else:
+            query = query.filter(or_(
+                created_col < created_at,
+                and_(created_col == created_at, id_col < row_id),
+                created_col.is_(None),
+            ))
+
+    if direction == "prev":
+        rows = query.order_by(created_col.asc().nullsfirst(), id_col.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_next, has_prev = bool(rows), has_more
+    else:
+        rows = query.order_by(created_col.desc().nullslast(), id_col.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        has_next, has_prev = has_more, bool(cursor) and bool(rows)
+
+    def _cursor(row, d):
+        created = getattr(row, created_col.key)
+        return encode_cursor({
+            "c": created.isoformat() if created is not None else None,
+            "i": getattr(row, id_col.key),
+            "d": d,
+        })
+
+    next_cursor = _cursor(rows[-1], "next") if rows and has_next else None
+    prev_cursor = _cursor(rows[0], "prev") if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def cached_count(cache_key, query, ttl=COUNT_CACHE_TTL):
+    """
+    COUNT(*) for a query, cached in Redis for `ttl` seconds.
+    For cursor pages that want an approximate total without paying the
+    COUNT on every request.
+    """
+    key = f"count:{cache_key}"
+    val = r.get(key)
+    if val is not None:
+        return int(val)
+    total = query.order_by(None).count()
+    r.setex(key, ttl, total)
+    return total
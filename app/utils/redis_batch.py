@@ -0,0 +1,94 @@
+"""
+Helpers for batching Redis commands into one round trip.
+
+    with redis_batch() as pipe:
+        push_bounded(pipe, key, value, maxlen=500, ttl=3600)
+        pipe.publish(channel, value)
+
+Commands queue on the pipeline and go out together when the block exits;
+nothing is sent if the block raises. transaction=True wraps them in
+MULTI/EXEC when they must apply atomically.
+"""
+from app.extensions import r
+
+
+class redis_batch:
+    """Context manager yielding a pipeline that executes on exit. Results land in .results."""
+
+    def __init__(self, transaction=False, client=None):
+        self.pipe = (client or r).pipeline(transaction=transaction)
+        self.results = None
+
+    def __enter__(self):
+        return self.pipe
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.results = self.pipe.execute()
+        else:
+            self.pipe.reset()
+        return False
+
+
+def push_bounded(pipe, key, value, maxlen, ttl=None, touch=()):
+    """Queue RPUSH + LTRIM (+ EXPIRE on key and any `touch` keys) for a capped list."""
+    pipe.rpush(key, value)
+    pipe.ltrim(key, -maxlen, -1)
+    if ttl:
+        pipe.expire(key, ttl)
+        for other in touch:
+            pipe.expire(other, ttl)
+    return pipe
+
+
+if __name__ == "__main__":
+    # Round trips per chat message, before and after batching:
+    #   python -m app.utils.redis_batch [messages]
+    import sys
+    import json
+    import time
+    from app.utils.chat.stream_log import append_message
+
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    connection_class = r.connection_pool.connection_class
+    original_send = connection_class.send_packed_command
+    sent = {"count": 0}
+
+    def counting_send(self, command, check_health=True):
+        sent["count"] += 1
+        return original_send(self, command, check_health)
+
+    connection_class.send_packed_command = counting_send
+    payload = json.dumps({"type": "chat_message", "message": "x" * 80})
+    key, meta, channel = "bench:chat:list", "bench:chat:meta", "bench:chat:channel"
+
+    def run(label, fn):
+        r.delete(key, meta, "bench:chat:stream", "bench:chat:seq")
+        sent["count"] = 0
+        started = time.perf_counter()
+        for _ in range(messages):
+            fn()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<34} {sent['count'] / messages:4.1f} round trips/msg  {messages / elapsed:8.0f} msg/s")
+
+    def separate_calls():
+        r.rpush(key, payload)
+        r.ltrim(key, -500, -1)
+        r.expire(key, 86400)
+        r.expire(meta, 86400)
+        r.publish(channel, payload)
+
+    def pipelined_list():
+        with redis_batch() as pipe:
+            push_bounded(pipe, key, payload, maxlen=500, ttl=86400, touch=(meta,))
+            pipe.publish(channel, payload)
+
+    def stream_append():
+        append_message("bench:chat:stream", "bench:chat:seq", {"message": "x" * 80},
+                       maxlen=500, ttl=86400, publish_channel=channel)
+
+    run("separate RPUSH/LTRIM/EXPIRE/PUBLISH", separate_calls)
+    run("pipelined list", pipelined_list)
+    run("stream append (Lua, with publish)", stream_append)
+    connection_class.send_packed_command = original_send
+    r.delete(key, meta, "bench:chat:stream", "bench:chat:seq")
@@ -0,0 +1,170 @@
+"""
+Redis clients, built from config.
+
+    from app.utils.redis_factory import get_redis, get_async_redis
+    r = get_redis("cache")
+
+Every client draws from a bounded BlockingConnectionPool: when all
+REDIS_MAX_CONNECTIONS connections are busy, callers wait up to
+REDIS_POOL_TIMEOUT seconds for one instead of opening more. Purposes
+(cache, sessions, pubsub, chat) are logical clients; each can point at its
+own server with REDIS_URL_<PURPOSE>, and purposes that resolve to the same
+URL and settings share one pool. "pubsub" connections have no read
+timeout, since a subscriber sits idle between messages.
+
+Pool utilization is exported under the "redis_pools" metrics name.
+"""
+import time
+import asyncio
+import weakref
+import threading
+import redis
+import redis.asyncio as aioredis
+from config import Config
+from app.utils.metrics import PoolStats, register_metrics
+
+DEFAULT = "default"
+CACHE = "cache"
+SESSIONS = "sessions"
+PUBSUB = "pubsub"
+CHAT = "chat"
+PURPOSES = (DEFAULT, CACHE, SESSIONS, PUBSUB, CHAT)
+
+POOL_EXHAUSTED = "No connection available."   # what redis-py raises after waiting REDIS_POOL_TIMEOUT
+
+_pools = {}          # (url, read timeout) -> sync pool
+_clients = {}        # purpose -> sync client
+# keyed by the loop object itself: a new loop can reuse a dead loop's id()
+_async_pools = weakref.WeakKeyDictionary()     # loop -> {(url, read timeout): async pool}
+_async_clients = weakref.WeakKeyDictionary()   # loop -> {purpose: async client}
+_lock = threading.Lock()
+
+
+class InstrumentedBlockingPool(redis.BlockingConnectionPool):
+    """BlockingConnectionPool that records checkouts, waits and timeouts."""
+
+    def __init__(self, *args, stats_name="redis", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats(stats_name, self.max_connections)
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except redis.ConnectionError as e:
+            if str(e) == POOL_EXHAUSTED:
+                self.stats.timed_out()
+            raise
+        self.stats.checked_out(time.perf_counter() - started)
+        return connection
+
+    def release(self, connection):
+        self.stats.released()
+        return super().release(connection)
+
+
+class InstrumentedAsyncBlockingPool(aioredis.BlockingConnectionPool):
+    """asyncio counterpart of InstrumentedBlockingPool."""
+
+    def __init__(self, *args, stats_name="redis", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats(stats_name, self.max_connections)
+
+    async def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except redis.ConnectionError as e:
+            if str(e) == POOL_EXHAUSTED:
+                self.stats.timed_out()
+            raise
+        self.stats.checked_out(time.perf_counter() - started)
+        return connection
+
+    async def release(self, connection):
+        self.stats.released()
+        return await super().release(connection)
+
+
+def redis_url(purpose=DEFAULT):
+    return Config.REDIS_URLS.get(purpose) or Config.REDIS_URL
+
+
+def _pool_options(purpose):
+    return {
+        "max_connections": Config.REDIS_MAX_CONNECTIONS,
+        "timeout": Config.REDIS_POOL_TIMEOUT,
+        "socket_timeout": None if purpose == PUBSUB else Config.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": Config.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": Config.REDIS_HEALTH_CHECK_INTERVAL,
+        "decode_responses": True,
+    }
+
+
+def _pool(purpose, loop=None):
+    """Shared pool for a purpose (an asyncio one bound to `loop` when given); call with _lock held."""
+    url = redis_url(purpose)
+    options = _pool_options(purpose)
+    key = (url, options["socket_timeout"])
+    pools = _pools if loop is None else _async_pools.setdefault(loop, {})
+    pool = pools.get(key)
+    if pool is None:
+        if loop is None:
+            pool = InstrumentedBlockingPool.from_url(url, stats_name=purpose, **options)
+        else:
+            pool = InstrumentedAsyncBlockingPool.from_url(url, stats_name=f"async:{purpose}@{id(loop):x}", **options)
+        pools[key] = pool
+    return pool
+
+
+def _forget_closed_loops():
+    """Drop pools and clients of loops that were closed; call with _lock held."""
+    for loop in [loop for loop in list(_async_pools) if loop.is_closed()]:
+        _async_pools.pop(loop, None)
+        _async_clients.pop(loop, None)
+
+
+def get_redis(purpose=DEFAULT):
+    """Sync client for `purpose` (one of PURPOSES), created on first use."""
+    if purpose not in PURPOSES:
+        raise ValueError(f"Unknown Redis purpose: {purpose}")
+    client = _clients.get(purpose)
+    if client is None:
+        with _lock:
+            client = _clients.get(purpose)
+            if client is None:
+                client = redis.Redis(connection_pool=_pool(purpose))
+                _clients[purpose] = client
+    return client
+
+
+def get_async_redis(purpose=DEFAULT):
+    """
+    redis.asyncio client for `purpose`. asyncio connections belong to the
+    event loop that opened them, so each running loop gets its own client
+    and pool; call from inside a coroutine.
+    """
+    if purpose not in PURPOSES:
+        raise ValueError(f"Unknown Redis purpose: {purpose}")
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop, {}).get(purpose)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(loop, {}).get(purpose)
+            if client is None:
+                _forget_closed_loops()
+                client = aioredis.Redis(connection_pool=_pool(purpose, loop))
+                _async_clients.setdefault(loop, {})[purpose] = client
+    return client
+
+
+def pool_metrics():
+    """Utilization of every pool opened so far, keyed by the purpose that opened it."""
+    with _lock:
+        pools = list(_pools.values())
+        for loop_pools in list(_async_pools.values()):
+            pools.extend(loop_pools.values())
+    return {pool.stats.name: pool.stats.snapshot() for pool in pools}
+
+
+register_metrics("redis_pools", pool_metrics)
@@ -1,9 +1,10 @@
 import json
 from app.extensions import r
 from app.extensions import socketio
+from app.utils.redis_factory import get_redis, PUBSUB
 
 def listen_vendor_status_changes():
-    pubsub = r.pubsub()
+    pubsub = get_redis(PUBSUB).pubsub()
     pubsub.subscribe("vendor_status_changes")
     for msg in pubsub.listen():
         if msg and msg.get("type") == "message":
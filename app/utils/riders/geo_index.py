@@ -0,0 +1,129 @@
+import time
+import logging
+from app.extensions import r, socketio
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RIDER_GEO_KEY = "riders:geo"              # GEO set: rider_id -> last known position
+RIDER_SEEN_KEY = "riders:seen"            # ZSET: rider_id -> unix time of last update
+RIDER_AVAILABLE_KEY = "riders:available"  # SET of rider ids that can take an order
+RIDER_ROOM = "rider:{rider_id}"           # per-rider Socket.IO room
+RIDERS_ROOM = "riders"                    # every connected rider, used only as a fallback
+RIDER_NAMESPACE = "/rider"                # where RiderNamespace joins riders to their rooms
+
+DISPATCH_COUNT = Config.RIDER_DISPATCH_COUNT
+DISPATCH_RADII_KM = Config.RIDER_DISPATCH_RADII_KM
+STALE_AFTER = Config.RIDER_LOCATION_STALE_AFTER
+
+
+def rider_room(rider_id):
+    return RIDER_ROOM.format(rider_id=rider_id)
+
+
+def update_rider_location(rider_id, lat, lng, pipe=None):
+    """
+    Record a rider's position; called on every location update.
+    Pass a pipeline to batch it with other writes (the caller executes it).
+    """
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = r.pipeline()
+    pipe.geoadd(RIDER_GEO_KEY, (float(lng), float(lat), str(rider_id)))
+    pipe.zadd(RIDER_SEEN_KEY, {str(rider_id): time.time()})
+    if own_pipe:
+        pipe.execute()
+
+
+def set_rider_available(rider_id, available=True):
+    if available:
+        r.sadd(RIDER_AVAILABLE_KEY, str(rider_id))
+    else:
+        r.srem(RIDER_AVAILABLE_KEY, str(rider_id))
+
+
+def remove_rider(rider_id):
+    """Drop a rider from dispatch entirely (disconnect, logout)."""
+    pipe = r.pipeline()
+    pipe.zrem(RIDER_GEO_KEY, str(rider_id))
+    pipe.zrem(RIDER_SEEN_KEY, str(rider_id))
+    pipe.srem(RIDER_AVAILABLE_KEY, str(rider_id))
+    pipe.execute()
+
+
+def _usable(candidates):
+    """Keep available riders with a fresh position; drop stale ones from the index."""
+    if not candidates:
+        return []
+    pipe = r.pipeline()
+    for rider_id, _ in candidates:
+        pipe.zscore(RIDER_SEEN_KEY, rider_id)
+        pipe.sismember(RIDER_AVAILABLE_KEY, rider_id)
+    flags = pipe.execute()
+
+    cutoff = time.time() - STALE_AFTER
+    usable, stale = [], []
+    for i, (rider_id, distance) in enumerate(candidates):
+        seen, available = flags[2 * i], flags[2 * i + 1]
+        if seen is None or seen < cutoff:
+            stale.append(rider_id)
+        elif available:
+            usable.append((int(rider_id), distance))
+
+    if stale:
+        pipe = r.pipeline()
+        pipe.zrem(RIDER_GEO_KEY, *stale)
+        pipe.zrem(RIDER_SEEN_KEY, *stale)
+        pipe.execute()
+    return usable
+
+
+def nearest_riders(lat, lng, k=DISPATCH_COUNT, radii_km=DISPATCH_RADII_KM):
+    """
+    [(rider_id, distance_km), ...] for up to k available riders nearest to
+    (lat, lng), closest first. The radius widens through radii_km until k
+    riders are found, so dense areas are answered from a small circle.
+    """
+    found = []
+    for radius in radii_km:
+        # over-fetch: some candidates will be busy or stale
+        candidates = r.geosearch(
+            RIDER_GEO_KEY,
+            longitude=float(lng),
+            latitude=float(lat),
+            radius=radius,
+            unit="km",
+            sort="ASC",
+            count=k * 3,
+            withdist=True,
+        )
+        found = _usable(candidates)
+        if len(found) >= k:
+            break
+    return found[:k]
+
+
+def dispatch_to_nearest(event, payload, lat, lng, k=DISPATCH_COUNT):
+    """
+    Emit `event` to the per-rider rooms of the k nearest available riders.
+    Returns the rider ids it went to. Without coordinates, or with nobody in
+    range, the order goes to the riders room so it is never silently dropped.
+    """
+    if lat is None or lng is None:
+        socketio.emit(event, payload, room=RIDERS_ROOM, namespace=RIDER_NAMESPACE)
+        return []
+
+    riders = nearest_riders(lat, lng, k)
+    if not riders:
+        logger.warning("No available rider near (%s, %s); offering to all riders", lat, lng)
+        socketio.emit(event, payload, room=RIDERS_ROOM, namespace=RIDER_NAMESPACE)
+        return []
+
+    for rider_id, distance in riders:
+        socketio.emit(
+            event,
+            dict(payload, distance_km=round(distance, 2)),
+            room=rider_room(rider_id),
+            namespace=RIDER_NAMESPACE,
+        )
+    return [rider_id for rider_id, _ in riders]
@@ -0,0 +1,126 @@
+"""
+Write-behind buffer for rider locations.
+
+Location pings only touch Redis: the live position goes into a hash per
+rider and the rider id into a dirty set. A background flusher drains the
+dirty set every RIDER_LOCATION_FLUSH_INTERVAL seconds and writes all
+pending positions to the riders table in one batched UPDATE.
+"""
+import time
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam
+from app.extensions import r, db
+from app.database.rider_models import Rider
+from app.utils.riders.geo_index import update_rider_location
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RIDER_LIVE_KEY = "rider:live:{rider_id}"     # hash: lat, lng, address, ts
+RIDER_DIRTY_KEY = "riders:location_dirty"    # SET of rider ids with unflushed positions
+
+FLUSH_INTERVAL = Config.RIDER_LOCATION_FLUSH_INTERVAL
+FLUSH_BATCH_SIZE = 500
+LIVE_TTL = 24 * 3600
+
+_flusher = {"started": False}
+_flusher_lock = threading.Lock()
+
+_update_riders = (
+    Rider.__table__.update()
+    .where(Rider.__table__.c.id == bindparam("rider_id"))
+    .values(
+        current_lat=bindparam("lat"),
+        current_lng=bindparam("lng"),
+        current_address=bindparam("address"),
+        last_update=bindparam("updated_at"),
+    )
+)
+
+
+def record_location(rider_id, lat, lng, address):
+    """Store a rider's live position and mark it for the next flush. Redis only, one round trip."""
+    key = RIDER_LIVE_KEY.format(rider_id=rider_id)
+    pipe = r.pipeline()
+    pipe.hset(key, mapping={"lat": lat, "lng": lng, "address": address, "ts": time.time()})
+    pipe.expire(key, LIVE_TTL)
+    pipe.sadd(RIDER_DIRTY_KEY, str(rider_id))
+    update_rider_location(rider_id, lat, lng, pipe=pipe)
+    pipe.execute()
+
+
+def get_live_location(rider_id):
+    """Latest position as {"lat", "lng", "address", "ts"}, or None if the rider has not pinged."""
+    data = r.hgetall(RIDER_LIVE_KEY.format(rider_id=rider_id))
+    if not data:
+        return None
+    return {
+        "lat": float(data["lat"]),
+        "lng": float(data["lng"]),
+        "address": data.get("address"),
+        "ts": float(data["ts"]),
+    }
+
+
+def flush_locations(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Write every pending live position to the riders table, batch_size rows
+    per UPDATE. SPOP hands each rider id to exactly one flushing worker.
+    Returns the number of riders written.
+    """
+    written = 0
+    while True:
+        rider_ids = r.spop(RIDER_DIRTY_KEY, batch_size)
+        if not rider_ids:
+            return written
+
+        pipe = r.pipeline()
+        for rider_id in rider_ids:
+            pipe.hgetall(RIDER_LIVE_KEY.format(rider_id=rider_id))
+        positions = pipe.execute()
+
+        params = [
+            {
+                "rider_id": int(rider_id),
+                "lat": float(pos["lat"]),
+                "lng": float(pos["lng"]),
+                "address": pos.get("address"),
+                "updated_at": datetime.utcfromtimestamp(float(pos["ts"])),
+            }
+            for rider_id, pos in zip(rider_ids, positions)
+            if pos
+        ]
+        if not params:
+            continue
+
+        try:
+            db.session.execute(_update_riders, params)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # put them back so the next tick retries
+            r.sadd(RIDER_DIRTY_KEY, *rider_ids)
+            raise
+        written += len(params)
+
+
+def _flush_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                flush_locations()
+        except Exception:
+            logger.exception("Rider location flush failed")
+
+
+def start_location_flusher(app, interval=FLUSH_INTERVAL):
+    """Start the write-behind flusher in a daemon thread (once per worker)."""
+    with _flusher_lock:
+        if _flusher["started"]:
+            return
+        _flusher["started"] = True
+    thread = threading.Thread(target=_flush_loop, args=(app, interval), daemon=True, name="rider-location-flusher")
+    thread.start()
@@ -0,0 +1,103 @@
+"""
+Coalescing broadcaster for /rider location updates.
+
+Incoming pings only overwrite the rider's pending position for its room.
+Every tick, each room with pending positions gets one `location_updates`
+event carrying the latest position of every rider that moved, so a chatty
+client costs at most one entry per tick instead of one emit per ping.
+"""
+import logging
+import threading
+from app.extensions import socketio
+from app.utils.geo.distance import distance_m
+from app.utils.metrics import Counters, register_metrics
+from app.utils.riders.geo_index import RIDER_NAMESPACE
+from config import Config
+
+TICK = Config.RIDER_BROADCAST_TICK_MS / 1000.0
+MIN_MOVE_METRES = Config.RIDER_BROADCAST_MIN_MOVE_M
+
+logger = logging.getLogger(__name__)
+
+_pending = {}    # room -> {rider_id: packet}
+_last_sent = {}  # rider_id -> (lat, lng) last broadcast
+_lock = threading.Lock()
+_state = {"started": False}
+
+broadcast_counters = Counters()
+
+
+def _metrics():
+    stats = broadcast_counters.snapshot().get("rider_locations", {})
+    received = stats.get("in", 0)
+    stats["out_ratio"] = round(stats.get("out", 0) / received, 4) if received else None
+    return stats
+
+
+register_metrics("rider_broadcast", _metrics)
+
+
+def queue_location(room, packet):
+    """
+    Queue a rider's location packet for the next tick.
+    Returns False when the rider has not moved MIN_MOVE_METRES since the
+    position last broadcast, in which case nothing is sent.
+    """
+    rider_id = packet["rider_id"]
+    lat = float(packet["position"]["lat"])
+    lng = float(packet["position"]["lng"])
+    broadcast_counters.incr("rider_locations", "in")
+
+    with _lock:
+        last = _last_sent.get(rider_id)
+        if last and distance_m(last[0], last[1], lat, lng) < MIN_MOVE_METRES:
+            broadcast_counters.incr("rider_locations", "suppressed")
+            return False
+        room_pending = _pending.setdefault(room, {})
+        if rider_id in room_pending:
+            broadcast_counters.incr("rider_locations", "coalesced")
+        room_pending[rider_id] = packet
+    return True
+
+
+def forget_rider(rider_id):
+    """Drop delta-suppression state, e.g. on disconnect, so the next ping always goes out."""
+    with _lock:
+        _last_sent.pop(rider_id, None)
+
+
+def flush_pending():
+    """Emit one batched `location_updates` event per room with pending positions."""
+    with _lock:
+        batches = dict(_pending)
+        _pending.clear()
+        for updates in batches.values():
+            for rider_id, packet in updates.items():
+                position = packet["position"]
+                _last_sent[rider_id] = (float(position["lat"]), float(position["lng"]))
+
+    for room, updates in batches.items():
+        socketio.emit(
+            "location_updates", {"updates": list(updates.values())}, room=room, namespace=RIDER_NAMESPACE
+        )
+        broadcast_counters.incr("rider_locations", "out", len(updates))
+        broadcast_counters.incr("rider_locations", "events")
+
+
+def _broadcast_loop(tick):
+    while True:
+        socketio.sleep(tick)
+        try:
+            flush_pending()
+        except Exception:
+            # a failed emit (e.g. the message-queue Redis blipped) must not end the task
+            logger.exception("Rider location broadcast failed")
+
+
+def start_location_broadcaster(tick=TICK):
+    """Start the tick loop as a Socket.IO background task (once per worker)."""
+    with _lock:
+        if _state["started"]:
+            return
+        _state["started"] = True
+    socketio.start_background_task(_broadcast_loop, tick)
@@ -0,0 +1,115 @@
+"""
+Race-free order claims for riders.
+
+Claiming and releasing an order are single Lua scripts, so exactly one
+rider wins no matter how many accept at once, and only the winner can
+release it. A successful claim also takes the rider out of dispatch
+(riders:available) and returns the customer's user id, all in one round trip.
+"""
+from app.extensions import r
+from app.utils.riders.geo_index import RIDER_AVAILABLE_KEY
+
+ORDER_CLAIM_KEY = "order:{order_id}:accepted_by"
+ORDER_USER_KEY = "order:{order_id}:user_id"
+CLAIM_TTL = 60 * 60
+
+# KEYS: claim, order user, available riders   ARGV: rider_id, ttl
+# -> {won (1/0), winning rider id, order user id or false}
+_CLAIM_LUA = """
+local user_id = redis.call('GET', KEYS[2])
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    redis.call('SREM', KEYS[3], ARGV[1])
+    return {1, ARGV[1], user_id}
+end
+return {0, redis.call('GET', KEYS[1]), user_id}
+"""
+
+# KEYS: claim, available riders   ARGV: rider_id
+# -> 1 released, 0 claimed by someone else, -1 not claimed
+_UNCLAIM_LUA = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    return -1
+end
+if owner ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+RELEASED = "released"
+NOT_OWNER = "not_owner"
+NOT_CLAIMED = "not_claimed"
+
+_claim_script = r.register_script(_CLAIM_LUA)
+_unclaim_script = r.register_script(_UNCLAIM_LUA)
+
+
+def claim_order(order_id, rider_id, ttl=CLAIM_TTL, available_key=RIDER_AVAILABLE_KEY):
+    """
+    Try to claim an order for a rider.
+    Returns (won, winner_rider_id, user_id); user_id is None when unknown.
+    `available_key` is the dispatch set the winner leaves; only the
+    benchmark below passes anything else.
+    """
+    won, winner, user_id = _claim_script(
+        keys=[
+            ORDER_CLAIM_KEY.format(order_id=order_id),
+            ORDER_USER_KEY.format(order_id=order_id),
+            available_key,
+        ],
+        args=[str(rider_id), ttl],
+    )
+    return bool(won), winner, user_id or None
+
+
+def unclaim_order(order_id, rider_id, available_key=RIDER_AVAILABLE_KEY):
+    """Release a claim, only if `rider_id` holds it. Returns RELEASED, NOT_OWNER or NOT_CLAIMED."""
+    result = _unclaim_script(
+        keys=[ORDER_CLAIM_KEY.format(order_id=order_id), available_key],
+        args=[str(rider_id)],
+    )
+    return {1: RELEASED, 0: NOT_OWNER, -1: NOT_CLAIMED}[int(result)]
+
+
+if __name__ == "__main__":
+    # Concurrency benchmark: many riders accept the same orders at once.
+    #   python -m app.utils.riders.order_claim [riders] [orders]
+    # Every key it touches is under bench:{run}: (orders, rider ids and its own
+    # availability set), so real riders are never taken out of dispatch.
+    import sys
+    import time
+    import threading
+
+    riders = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    orders = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    base = int(time.time())
+    bench_available = f"bench:{base}:riders:available"
+    winners = {}
+    lock = threading.Lock()
+    start = threading.Barrier(riders)
+
+    def rider(rider_id):
+        start.wait()
+        for n in range(orders):
+            won, _, _ = claim_order(f"bench:{base}:{n}", rider_id, ttl=60, available_key=bench_available)
+            if won:
+                with lock:
+                    winners.setdefault(n, []).append(rider_id)
+
+    r.sadd(bench_available, *[f"bench:{base}:rider:{i}" for i in range(riders)])
+    threads = [threading.Thread(target=rider, args=(f"bench:{base}:rider:{i}",)) for i in range(riders)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    attempts = riders * orders
+    doubles = {n: ids for n, ids in winners.items() if len(ids) > 1}
+    print(f"{attempts} claims in {elapsed:.2f}s ({attempts / elapsed:.0f}/s)")
+    print(f"{len(winners)}/{orders} orders claimed, {len(doubles)} with more than one winner")
+    r.delete(bench_available, *[ORDER_CLAIM_KEY.format(order_id=f"bench:{base}:{n}") for n in range(orders)])
@@ -0,0 +1,40 @@
+import json
+from app.extensions import r, db
+from app.database.rider_models import Rider
+from app.database.user_models import User
+
+RIDER_PROFILE_KEY = "rider:profile:{rider_id}"
+PROFILE_TTL = 3600
+
+
+def get_rider_profile(rider_id):
+    """
+    {"rider_id", "rider_name", "rider_phone"} for a rider, from Redis after
+    the first lookup. Unknown riders are cached too, with empty fields.
+    """
+    key = RIDER_PROFILE_KEY.format(rider_id=rider_id)
+    cached = r.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    row = (
+        db.session.query(User.name, User.phone)
+        .join(Rider, Rider.user_id == User.id)
+        .filter(Rider.id == rider_id)
+        .first()
+    )
+    profile = {
+        "rider_id": int(rider_id),
+        "rider_name": (row.name if row else None) or "",
+        "rider_phone": (row.phone if row else None) or "",
+    }
+    r.setex(key, PROFILE_TTL, json.dumps(profile))
+    return profile
+
+
+def get_rider_name(rider_id):
+    return get_rider_profile(rider_id)["rider_name"] or "Unknown"
+
+
+def invalidate_rider_profile(rider_id):
+    r.delete(RIDER_PROFILE_KEY.format(rider_id=rider_id))
@@ -0,0 +1,254 @@
+import math
+import re
+import bisect
+import logging
+from types import SimpleNamespace
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.extensions import r
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.merchants.Database.vendors_data_base import FoodItem
+
+logger = logging.getLogger(__name__)
+
+# Columns that feed the index, with a weight applied to the term frequency
+INDEX_FIELDS = {
+    "product_name": 2,
+    "item_name": 2,
+    "vendor_name": 1,
+    "description": 1,
+}
+
+# Redis key patterns
+POSTINGS_KEY = "search_idx:postings:{term}"  # hash item_id -> weighted term frequency
+DOC_TERMS_KEY = "search_idx:doc:{item_id}"   # hash term -> weighted term frequency (for removal)
+DOC_LEN_KEY = "search_idx:doclen"            # hash item_id -> document length
+STATS_KEY = "search_idx:stats"               # hash doc_count / total_len
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MIN_TERM_LEN = 2
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# session.info key used to collect changed items until the transaction commits
+_PENDING_KEY = "search_index_pending"
+
+
+def tokenize(text):
+    """Lowercase a string and split it into index terms."""
+    if not text:
+        return []
+    return [t for t in TOKEN_RE.findall(str(text).lower()) if len(t) >= MIN_TERM_LEN]
+
+
+def _item_terms(item):
+    """Return {term: weighted_tf} for a FoodItem."""
+    terms = {}
+    for field, weight in INDEX_FIELDS.items():
+        for term in tokenize(getattr(item, field, None)):
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def remove_item(item_id):
+    """Drop an item from the index. Safe to call for items that were never indexed."""
+    doc_key = DOC_TERMS_KEY.format(item_id=item_id)
+    old_terms = r.hgetall(doc_key)
+    if not old_terms:
+        return
+
+    old_len = sum(int(tf) for tf in old_terms.values())
+    pipe = r.pipeline()
+    for term in old_terms:
+        pipe.hdel(POSTINGS_KEY.format(term=term), item_id)
+    pipe.delete(doc_key)
+    pipe.hdel(DOC_LEN_KEY, item_id)
+    pipe.hincrby(STATS_KEY, "doc_count", -1)
+    pipe.hincrby(STATS_KEY, "total_len", -old_len)
+    pipe.execute()
+
+
+def index_item(item):
+    """
+    Add or refresh a single FoodItem in the index.
+    Unavailable items are removed so search only returns what can be ordered.
+    """
+    remove_item(item.id)
+    if not item.is_available:
+        return
+
+    terms = _item_terms(item)
+    if not terms:
+        return
+
+    doc_len = sum(terms.values())
+    pipe = r.pipeline()
+    for term, tf in terms.items():
+        pipe.hset(POSTINGS_KEY.format(term=term), item.id, tf)
+    pipe.hset(DOC_TERMS_KEY.format(item_id=item.id), mapping=terms)
+    pipe.hset(DOC_LEN_KEY, item.id, doc_len)
+    pipe.hincrby(STATS_KEY, "doc_count", 1)
+    pipe.hincrby(STATS_KEY, "total_len", doc_len)
+    pipe.execute()
+
+
+def rebuild_index(batch_size=500):
+    """
+    Rebuild the whole index from the food_items table.
+    Run once after deploying, or whenever the index is suspected to be out of sync.
+    """
+    keys = list(r.scan_iter("search_idx:*"))
+    if keys:
+        r.delete(*keys)
+
+    count = 0
+    query = FoodItem.query.filter(FoodItem.is_available == True).order_by(FoodItem.id)
+    for item in query.yield_per(batch_size):
+        index_item(item)
+        count += 1
+    logger.info("Search index rebuilt with %s items", count)
+    return count
+
+
+def rank_products(search_query):
+    """
+    Return [(item_id, score), ...] for a free-text query, best BM25 score first.
+    Only the postings of the query terms are read, so the cost grows with
+    the number of matches rather than the size of the catalog.
+    """
+    terms = list(dict.fromkeys(tokenize(search_query)))
+    if not terms:
+        return []
+
+    pipe = r.pipeline()
+    pipe.hgetall(STATS_KEY)
+    for term in terms:
+        pipe.hgetall(POSTINGS_KEY.format(term=term))
+    stats, *postings = pipe.execute()
+
+    doc_count = int(stats.get("doc_count", 0) or 0)
+    if doc_count <= 0:
+        return []
+    avg_len = int(stats.get("total_len", 0) or 0) / doc_count or 1
+
+    candidate_ids = set()
+    for plist in postings:
+        candidate_ids.update(plist.keys())
+    if not candidate_ids:
+        return []
+
+    candidate_ids = list(candidate_ids)
+    doc_lens = dict(zip(candidate_ids, r.hmget(DOC_LEN_KEY, candidate_ids)))
+
+    scores = {}
+    for plist in postings:
+        df = len(plist)
+        if not df:
+            continue
+        idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        for item_id, tf in plist.items():
+            tf = int(tf)
+            dl = int(doc_lens.get(item_id) or 0)
+            norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avg_len))
+            scores[item_id] = scores.get(item_id, 0.0) + idf * norm
+
+    # newest item wins a tie, matching the old created_at ordering as closely as ids allow
+    ranked = [(int(item_id), score) for item_id, score in scores.items()]
+    ranked.sort(key=_rank_key)
+    return ranked
+
+
+def _rank_key(entry):
+    item_id, score = entry
+    return (-score, -item_id)
+
+
+def search_product_ids(search_query, page=1, per_page=10):
+    """Offset pagination over the ranked results: returns (item_ids, total)."""
+    ranked = rank_products(search_query)
+    start = (page - 1) * per_page
+    return [item_id for item_id, _ in ranked[start:start + per_page]], len(ranked)
+
+
+def search_product_cursor(search_query, limit=10, cursor=None):
+    """
+    Keyset pagination over the ranked results, keyed on (score, item_id).
+    Returns (item_ids, next_cursor, prev_cursor, total).
+    """
+    ranked = rank_products(search_query)
+    keys = [_rank_key(entry) for entry in ranked]
+
+    start = 0
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            cursor_key = _rank_key((int(data["i"]), float(data["s"])))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        if data.get("d") == "prev":
+            # the cursor row opened the page we came back from; stop just before it
+            start = max(bisect.bisect_left(keys, cursor_key) - limit, 0)
+        else:
+            start = bisect.bisect_right(keys, cursor_key)
+
+    page = ranked[start:start + limit]
+    next_cursor = prev_cursor = None
+    if page and start + limit < len(ranked):
+        item_id, score = page[-1]
+        next_cursor = encode_cursor({"s": score, "i": item_id, "d": "next"})
+    if page and start > 0:
+        item_id, score = page[0]
+        prev_cursor = encode_cursor({"s": score, "i": item_id, "d": "prev"})
+    return [item_id for item_id, _ in page], next_cursor, prev_cursor, len(ranked)
+
+
+# ---------------------- Incremental updates ----------------------
+def _mark_pending(target, removed=False):
+    session = object_session(target)
+    if session is None:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    if removed:
+        pending[target.id] = None
+        return
+    # snapshot now: attributes are expired after commit and no SQL may run in after_commit
+    snapshot = {field: getattr(target, field, None) for field in INDEX_FIELDS}
+    pending[target.id] = SimpleNamespace(id=target.id, is_available=target.is_available, **snapshot)
+
+
+@event.listens_for(FoodItem, "after_insert")
+def _food_item_inserted(mapper, connection, target):
+    _mark_pending(target)
+
+
+@event.listens_for(FoodItem, "after_update")
+def _food_item_updated(mapper, connection, target):
+    _mark_pending(target)
+
+
+@event.listens_for(FoodItem, "after_delete")
+def _food_item_deleted(mapper, connection, target):
+    _mark_pending(target, removed=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for item_id, item in pending.items():
+        try:
+            if item is None:
+                remove_item(item_id)
+            else:
+                index_item(item)
+        except Exception:
+            # the DB write already succeeded; a rebuild_index() will repair the index
+            logger.exception("Failed to update search index for item %s", item_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,156 @@
+import json
+import math
+import time
+import uuid
+import random
+import logging
+from functools import wraps
+from app.utils.redis_factory import get_redis, CACHE
+from app.utils.metrics import Counters, register_metrics
+from app.utils.http_cache import make_etag
+
+logger = logging.getLogger(__name__)
+r = get_redis(CACHE)
+
+SWR_LOCK_KEY = "swr_lock:{key}"
+
+DEFAULT_TTL = 300          # seconds a value is fresh
+DEFAULT_STALE_TTL = 600    # extra seconds a stale value may still be served
+DEFAULT_JITTER = 0.1       # +/- fraction applied to the fresh TTL
+DEFAULT_LOCK_TTL = 30      # seconds the recompute lock is held at most
+MISS_WAIT = 2.0            # seconds a cold-miss caller waits for the lock holder
+MISS_POLL_INTERVAL = 0.05
+
+# KEYS: lock   ARGV: owner token -> 1 released, 0 no longer ours (expired, maybe re-taken)
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_script = r.register_script(_RELEASE_LUA)
+
+cache_counters = Counters()
+register_metrics("cache", cache_counters.snapshot)
+
+
+def _jittered(ttl, jitter):
+    return ttl * (1 + random.uniform(-jitter, jitter))
+
+
+def max_served_age(ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, jitter=DEFAULT_JITTER):
+    """Longest a value stored with these settings can still be served, in seconds."""
+    return ttl * (1 + jitter) + stale_ttl
+
+
+def _etag(envelope):
+    # envelopes written before ETags were stored get one derived on read
+    return envelope.get("etag") or make_etag(json.dumps(envelope["v"], sort_keys=True))
+
+
+def _store(key, value, delta, ttl, stale_ttl, jitter):
+    """Write the envelope and return its ETag, hashed once here rather than per request."""
+    fresh_for = _jittered(ttl, jitter)
+    etag = make_etag(json.dumps(value, sort_keys=True))
+    envelope = {"v": value, "fresh_until": time.time() + fresh_for, "delta": delta, "etag": etag}
+    r.setex(key, int(math.ceil(fresh_for + stale_ttl)), json.dumps(envelope))
+    return etag
+
+
+def _compute(fn, args, kwargs):
+    started = time.time()
+    value = fn(*args, **kwargs)
+    return value, time.time() - started
+
+
+def _should_refresh_early(envelope, beta):
+    """
+    Probabilistic early expiration (XFetch): the closer a value is to
+    expiring, and the longer it took to compute, the likelier a request
+    refreshes it ahead of time. beta=0 disables it.
+    """
+    if not beta:
+        return False
+    delta = envelope.get("delta") or 0
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= envelope["fresh_until"]
+
+
+def swr_cached(name, key_func, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, jitter=DEFAULT_JITTER,
+               early_refresh_beta=0.0, lock_ttl=DEFAULT_LOCK_TTL):
+    """
+    Redis cache decorator with stale-while-revalidate and single-flight recompute.
+
+    - fresh value: returned as is (hit)
+    - stale value: the caller that wins the Redis lock recomputes, everyone
+      else keeps getting the stale value until the new one lands (stale)
+    - no value: one caller computes, the others wait briefly for it (miss)
+
+    key_func(*args, **kwargs) builds the cache key suffix. The wrapped
+    function must return a JSON-serializable value; exceptions propagate
+    and nothing is cached. wrapper.with_etag(...) returns (value, etag),
+    the ETag being a hash of the cached value computed when it was stored.
+    """
+    def decorator(fn):
+        def fetch(args, kwargs):
+            """(value, etag) for this call, going through the cache."""
+            key = f"{name}:{key_func(*args, **kwargs)}"
+            lock_key = SWR_LOCK_KEY.format(key=key)
+            token = uuid.uuid4().hex
+
+            raw = r.get(key)
+            envelope = json.loads(raw) if raw else None
+
+            if envelope is not None:
+                expired = time.time() >= envelope["fresh_until"]
+                if not expired and not _should_refresh_early(envelope, early_refresh_beta):
+                    cache_counters.incr(name, "hit")
+                    return envelope["v"], _etag(envelope)
+
+                if not r.set(lock_key, token, nx=True, ex=lock_ttl):
+                    # someone else is already recomputing
+                    cache_counters.incr(name, "stale" if expired else "hit")
+                    return envelope["v"], _etag(envelope)
+
+                cache_counters.incr(name, "refresh" if expired else "early_refresh")
+                try:
+                    value, delta = _compute(fn, args, kwargs)
+                    return value, _store(key, value, delta, ttl, stale_ttl, jitter)
+                except Exception:
+                    logger.exception("Recompute failed for %s; serving stale value", key)
+                    cache_counters.incr(name, "refresh_error")
+                    return envelope["v"], _etag(envelope)
+                finally:
+                    _release_script(keys=[lock_key], args=[token])
+
+            cache_counters.incr(name, "miss")
+            if not r.set(lock_key, token, nx=True, ex=lock_ttl):
+                # single flight: wait for the lock holder's value before computing ourselves
+                deadline = time.time() + MISS_WAIT
+                while time.time() < deadline:
+                    time.sleep(MISS_POLL_INTERVAL)
+                    raw = r.get(key)
+                    if raw:
+                        cache_counters.incr(name, "coalesced")
+                        envelope = json.loads(raw)
+                        return envelope["v"], _etag(envelope)
+                value, delta = _compute(fn, args, kwargs)
+                return value, _store(key, value, delta, ttl, stale_ttl, jitter)
+
+            try:
+                value, delta = _compute(fn, args, kwargs)
+                return value, _store(key, value, delta, ttl, stale_ttl, jitter)
+            finally:
+                _release_script(keys=[lock_key], args=[token])
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return fetch(args, kwargs)[0]
+
+        def with_etag(*args, **kwargs):
+            """Same as calling the function, but returns (value, etag) for conditional GETs."""
+            return fetch(args, kwargs)
+
+        wrapper.with_etag = with_etag
+        return wrapper
+    return decorator
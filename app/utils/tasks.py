@@ -1,7 +1,7 @@
 
 from threading import Thread
 from app.utils.email_helper import  send_email
-from app.whatsapp.whatsapphandler import WhatsAppClient  
+from app.whatsapp.utils.cloud_sender import get_whatsapp_sender
 
 def run_async(func, *args, **kwargs):
     """Run a function asynchronously in a thread."""
@@ -11,8 +11,7 @@ def send_email_notification(to_email, subject, body, html_body=None):
     return send_email(to_email, subject, body, html_body)
 
 def send_whatsapp_message(to, message):
-    client = WhatsAppClient(token="YOUR_TOKEN", phone_number_id="YOUR_PHONE_ID")
-    return client.send_text(to=to, message=message)
+    return get_whatsapp_sender().send_text(to=to, message=message)
 
 def _send_notification(notification_id):
     """
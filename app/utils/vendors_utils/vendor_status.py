@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import jsonify, g, request, current_app
 from app.extensions import r, Base, socketio
+from app.utils.redis_factory import get_redis, PUBSUB
 from app.merchants.Database.vendors_data_base import Vendor  # adjust path
 import json
 
@@ -18,7 +19,7 @@ def cache_vendor_status(vendor_id, status):
     key = f"vendor_status:{vendor_id}"
     r.setex(key, VENDOR_STATUS_TTL, status)
     # publish change for other processes
-    r.publish("vendor_status_changes", json.dumps({"vendor_id": vendor_id, "status": status}))
+    get_redis(PUBSUB).publish("vendor_status_changes", json.dumps({"vendor_id": vendor_id, "status": status}))
 
 def vendor_must_be_open(fn):
     """
@@ -6,9 +6,12 @@ from flask_socketio import emit, join_room, leave_room
 from app.extensions import socketio, r, db
 from app.auth.jwt_utils import decode_jwt  # your JWT resolver
 from app.models import User, Vendor
+from app.utils.chat.stream_log import append_message, read_since
+from app.websocket.socket_session import open_session, current_identity, close_session
 
 # Redis chat constants
-REDIS_CHAT_LIST_KEY = "chat:messages:{room_id}"
+REDIS_CHAT_STREAM_KEY = "chat:stream:{room_id}"
+REDIS_CHAT_SEQ_KEY = "chat:seq:{room_id}"
 MAX_CHAT_HISTORY = 500
 CHAT_TTL = 24 * 3600  # 24h
 
@@ -21,7 +24,9 @@ def get_user_from_token(token: str):
     """Resolve JWT → Redis cache → DB."""
     if not token:
         return None
-    payload = decode_jwt(token)
+    return _user_from_payload(decode_jwt(token))
+
+def _user_from_payload(payload: Optional[dict]):
     if not payload:
         return None
     user_id = payload.get("sub")
@@ -48,23 +53,28 @@ def get_user_from_token(token: str):
     return user
 
 def save_message_redis(room_id: str, msg: dict):
-    """Append a message to Redis list for this room."""
-    key = REDIS_CHAT_LIST_KEY.format(room_id=room_id)
+    """
+    Append a message to the room's stream, publish it on room:<room_id> and
+    stamp it with its stream id and sequence. One round trip.
+    """
     try:
-        r.rpush(key, json.dumps(msg))
-        r.ltrim(key, -MAX_CHAT_HISTORY, -1)
-        r.expire(key, CHAT_TTL)
+        msg["id"], msg["seq"] = append_message(
+            REDIS_CHAT_STREAM_KEY.format(room_id=room_id),
+            REDIS_CHAT_SEQ_KEY.format(room_id=room_id),
+            msg,
+            maxlen=MAX_CHAT_HISTORY,
+            ttl=CHAT_TTL,
+            publish_channel=f"room:{room_id}",
+        )
     except Exception:
         current_app.logger.exception(f"Failed saving message for room {room_id}")
 
-def get_message_history(room_id: str, limit: int = 50):
-    """Fetch last N messages for a room."""
-    key = REDIS_CHAT_LIST_KEY.format(room_id=room_id)
+def get_message_history(room_id: str, last_id: Optional[str] = None, limit: int = 50):
+    """Messages after last_id (or the last N), plus whether more are waiting."""
     try:
-        vals = r.lrange(key, -limit, -1)
-        return [json.loads(v) for v in vals]
+        return read_since(REDIS_CHAT_STREAM_KEY.format(room_id=room_id), last_id, limit)
     except Exception:
-        return []
+        return [], False
 
 # ----- SocketIO Handlers -----
 @socketio.on("connect", namespace="/bargain")
@@ -75,20 +85,26 @@ def handle_connect(auth=None):
         token = auth.get("token")
     if not token:
         token = request.args.get("token")
-    user = get_user_from_token(token)
-    if not user:
+    payload = decode_jwt(token) if token else None
+    user = _user_from_payload(payload)
+    # identity is resolved once here; later events read it from the socket session
+    if not user or not open_session(user, payload):
         return False  # reject connection
     emit("connected", {"message": "authenticated", "user": user}, room=request.sid)
 
+@socketio.on("disconnect", namespace="/bargain")
+def handle_disconnect():
+    close_session()
+
 @socketio.on("join_room", namespace="/bargain")
 def on_join(data):
     """
     Join a room.
     For 1:1: data={"partner": <user_id>}
     For group: data={"room_id": <room_id>}
+    Reconnecting clients pass "last_id" (the last message id they saw) to get only the delta.
     """
-    token = data.get("token")
-    user = get_user_from_token(token)
+    user = current_identity()
     if not user:
         emit("error", {"error": "auth required"}, room=request.sid)
         return
@@ -103,9 +119,9 @@ def on_join(data):
         return
 
     join_room(room_id)
-    # Send last 100 messages
-    history = get_message_history(room_id, limit=100)
-    emit("room_history", {"room_id": room_id, "history": history}, room=request.sid)
+    # Send what the client missed, or the last 100 messages on a first join
+    history, has_more = get_message_history(room_id, data.get("last_id"), limit=100)
+    emit("room_history", {"room_id": room_id, "history": history, "has_more": has_more}, room=request.sid)
     emit("joined", {"room_id": room_id, "user": user}, room=request.sid)
 
 @socketio.on("leave_room", namespace="/bargain")
@@ -121,14 +137,13 @@ def on_leave(data):
 def on_send_message(data):
     """
     Send a chat message.
-    data={"message": <str>, "room_id": <str>, "token": <jwt>, "recipient_id": <optional>}
+    data={"message": <str>, "room_id": <str>, "recipient_id": <optional>}
     """
-    token = data.get("token")
     message = (data.get("message") or "").strip()
     room_id = data.get("room_id")
     recipient_id = data.get("recipient_id")
 
-    user = get_user_from_token(token)
+    user = current_identity()
     if not user or not message or not room_id:
         emit("error", {"error": "invalid payload"}, room=request.sid)
         return
@@ -142,20 +157,15 @@ def on_send_message(data):
         "ts": datetime.utcnow().isoformat()
     }
 
-    # Save & publish
+    # Save & publish (one round trip)
     save_message_redis(room_id, payload)
-    try:
-        r.publish(f"room:{room_id}", json.dumps(payload))
-    except Exception:
-        current_app.logger.exception("failed to publish message")
 
     emit("chat_message", payload, room=room_id)
 
 @socketio.on("offer_fee", namespace="/bargain")
 def on_offer_fee(data):
     """Optional: same as send_message but for fee offers in group delivery rooms."""
-    token = data.get("token")
-    user = get_user_from_token(token)
+    user = current_identity()
     if not user:
         emit("error", {"error": "auth required"}, room=request.sid)
         return
@@ -177,9 +187,5 @@ def on_offer_fee(data):
     }
 
     save_message_redis(room_id, payload)
-    try:
-        r.publish(f"room:{room_id}", json.dumps(payload))
-    except Exception:
-        current_app.logger.exception("failed to publish fee offer")
     emit("fee_update", payload, room=room_id)
 
@@ -4,12 +4,16 @@ from flask import current_app
 from flask_socketio import join_room, leave_room, emit
 from app.extensions import socketio, r, db
 from app.merchant.Database.delivery import Delivery
-from app.merchant.Database import BargainMessage as BargainMessageModel  # adjust if different path
-from app.utils import verify_jwt_socket  # earlier helper
+from app.utils.auth_utils.auth import decode_jwt_socket
 from app.database.user_models import User
+from app.utils.chat.stream_log import append_message, read_since
+from app.utils.chat.bargain_persister import queue_bargain_message
+from app.utils.redis_batch import redis_batch
+from app.websocket.socket_session import open_session, current_identity, close_session
 
 # Redis key patterns
-REDIS_BARGAIN_LIST_KEY = "bargain:messages:{delivery_id}"     # list of json messages (latest at tail)
+REDIS_BARGAIN_STREAM_KEY = "bargain:stream:{delivery_id}"    # stream of json messages
+REDIS_BARGAIN_SEQ_KEY = "bargain:seq:{delivery_id}"          # per-delivery message sequence
 REDIS_BARGAIN_LOCK = "bargain:lock:{delivery_id}"
 REDIS_BARGAIN_FEE_KEY = "bargain:fee:{delivery_id}"          # latest fee (float or string)
 
@@ -18,36 +22,18 @@ MAX_HISTORY = 500
 
 
 def _save_message_redis(delivery_id: int, msg: dict):
-    key = REDIS_BARGAIN_LIST_KEY.format(delivery_id=delivery_id)
-    r.rpush(key, json.dumps(msg))
-    # trim to keep list bounded
-    r.ltrim(key, -MAX_HISTORY, -1)
-
-
-def _get_history_redis(delivery_id: int, limit: int = 100):
-    key = REDIS_BARGAIN_LIST_KEY.format(delivery_id=delivery_id)
-    vals = r.lrange(key, -limit, -1) or []
-    return [json.loads(v) for v in vals]
-
-
-def _save_message_db(order_id: str, sender_id: int, recipient_id: int, message: str, seq_id: int):
-    bm = BargainMessageModel(
-        order_id=order_id,
-        sender_id=sender_id,
-        recipient_id=recipient_id,
-        message=message,
-        metadata=None,
-        sequence_id=seq_id,
-        created_at=datetime.utcnow()
+    """Append to the delivery's stream (bounded) and stamp msg with its id and sequence."""
+    msg["id"], msg["seq"] = append_message(
+        REDIS_BARGAIN_STREAM_KEY.format(delivery_id=delivery_id),
+        REDIS_BARGAIN_SEQ_KEY.format(delivery_id=delivery_id),
+        msg,
+        maxlen=MAX_HISTORY,
     )
-    db.session.add(bm)
-    try:
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-        current_app.logger.exception("Failed saving bargain message to DB")
-        return None
-    return bm
+    return msg["seq"]
+
+
+def _get_history_redis(delivery_id: int, last_id: str = None, limit: int = 100):
+    return read_since(REDIS_BARGAIN_STREAM_KEY.format(delivery_id=delivery_id), last_id, limit)
 
 
 @socketio.on("connect")
@@ -55,7 +41,8 @@ def on_connect(auth):
     """
     When a client connects, they should pass token either in query string as ?token=...,
     or in the connect 'auth' payload (socket.io v3+ supports auth payload).
-    We'll validate that token and store user object in session (flask-socketio).
+    We validate that token once and keep the identity in the socket session;
+    later events read it from there instead of re-verifying the token.
     """
     token = None
     # preferred location: auth payload
@@ -69,31 +56,31 @@ def on_connect(auth):
         token = current_app.socketio.server.environ.get(request.sid, {}).get("QUERY_STRING")
         # not ideal; in many deployments token will be set in auth payload
 
-    user = None
-    if token:
-        user = verify_jwt_socket(token)
+    payload = decode_jwt_socket(token) if token else None
+    user = db.session.get(User, payload.get("user_id")) if payload else None
     if not user:
         # reject connection
         return False  # disconnects client
 
-    # we can set user on the socket session
-    # flask-socketio's 'session' is separate from flask.session; use `flask_socketio` session if needed
-    # but for simplicity, we store small info in server-side 'r' if necessary
+    identity = {"id": user.id, "name": getattr(user, "name", None), "type": "user"}
+    if not open_session(identity, payload):
+        return False  # token revoked
+
     emit("connected", {"message": "authenticated"})
 
 
+@socketio.on("disconnect")
+def on_disconnect():
+    close_session()
+
+
 @socketio.on("join_bargain")
 def on_join_bargain(data):
     """
-    data: { "delivery_id": <int>, "token": <jwt optional if not passed in connect> }
+    data: { "delivery_id": <int>, "last_id": <last message id seen, optional> }
     """
-    token = data.get("token")
     delivery_id = data.get("delivery_id")
-    if token:
-        user = verify_jwt_socket(token)
-    else:
-        # try to use verification again (some clients connect without auth)
-        user = None
+    user = current_identity()
     if not user:
         emit("error", {"error": "authentication required"})
         return
@@ -107,9 +94,9 @@ def on_join_bargain(data):
     room = f"delivery:{delivery_id}"
     join_room(room)
 
-    # send last history
-    history = _get_history_redis(delivery_id, limit=200)
-    emit("bargain_history", {"history": history}, room=request.sid)
+    # send only what the client missed (or the last 200 on a first join)
+    history, has_more = _get_history_redis(delivery_id, data.get("last_id"), limit=200)
+    emit("bargain_history", {"history": history, "has_more": has_more}, room=request.sid)
 
 
 @socketio.on("leave_bargain")
@@ -123,17 +110,13 @@ def on_leave_bargain(data):
 @socketio.on("offer_fee")
 def on_offer_fee(data):
     """
-    data: { "delivery_id": int, "fee": float, "message": str (optional), "token": <jwt optional> }
+    data: { "delivery_id": int, "fee": float, "message": str (optional) }
     """
-    token = data.get("token")
     delivery_id = data.get("delivery_id")
     fee = data.get("fee")
     message = data.get("message", "")
 
-    if token:
-        user = verify_jwt_socket(token)
-    else:
-        user = None
+    user = current_identity()
 
     if not user:
         emit("error", {"error": "authentication required"})
@@ -146,29 +129,31 @@ def on_offer_fee(data):
         emit("error", {"error": "invalid fee"})
         return
 
-    # store latest fee in redis
-    fee_key = REDIS_BARGAIN_FEE_KEY.format(delivery_id=delivery_id)
-    r.set(fee_key, json.dumps({"fee": fee, "by_user": user.id, "ts": datetime.utcnow().isoformat()}))
-
     # message payload to broadcast
     payload = {
         "delivery_id": delivery_id,
         "new_fee": fee,
-        "by_user": {"id": user.id, "name": getattr(user, "name", "")},
+        "by_user": {"id": user["id"], "name": user.get("name", "")},
         "message": message,
         "ts": datetime.utcnow().isoformat()
     }
 
-    # Save to redis history
-    _save_message_redis(delivery_id, {"type": "fee_offer", **payload})
+    # Save to redis history; the stream assigns the sequence id
+    payload["type"] = "fee_offer"
+    seq = _save_message_redis(delivery_id, payload)
 
-    # Persist to DB (sequence id found from redis length)
-    seq = r.llen(REDIS_BARGAIN_LIST_KEY.format(delivery_id=delivery_id))
+    # Latest fee + DB persistence queue (written in batches by the bargain persister), one round trip
+    fee_key = REDIS_BARGAIN_FEE_KEY.format(delivery_id=delivery_id)
     try:
-        _save_message_db(str(delivery_id), user.id, None, f"Fee offer: {fee} {message}", seq)
+        with redis_batch() as pipe:
+            pipe.set(fee_key, json.dumps({"fee": fee, "by_user": user["id"], "ts": payload["ts"]}))
+            # fee offers go to the whole room: no recipient
+            queue_bargain_message(
+                str(delivery_id), user["id"], None, f"Fee offer: {fee} {message}", seq, client=pipe
+            )
     except Exception:
-        # DB save failure should not block broadcast
-        current_app.logger.exception("failed to persist fee offer")
+        # persistence failure should not block broadcast
+        current_app.logger.exception("failed to store fee offer")
 
     # Broadcast to room
     room = f"delivery:{delivery_id}"
@@ -178,17 +163,13 @@ def on_offer_fee(data):
 @socketio.on("send_message")
 def on_send_message(data):
     """
-    data: { "delivery_id": int, "message": str, "recipient_id": int (optional), "token": <jwt optional> }
+    data: { "delivery_id": int, "message": str, "recipient_id": int (optional) }
     """
-    token = data.get("token")
     delivery_id = data.get("delivery_id")
     message = data.get("message", "").strip()
     recipient_id = data.get("recipient_id")
 
-    if token:
-        user = verify_jwt_socket(token)
-    else:
-        user = None
+    user = current_identity()
 
     if not user:
         emit("error", {"error": "authentication required"})
@@ -202,19 +183,19 @@ def on_send_message(data):
         "type": "chat_message",
         "delivery_id": delivery_id,
         "message": message,
-        "sender": {"id": user.id, "name": getattr(user, "name", None)},
+        "sender": {"id": user["id"], "name": user.get("name")},
         "recipient_id": recipient_id,
         "ts": datetime.utcnow().isoformat(),
     }
 
-    # Save to redis chat list & persist to DB
-    _save_message_redis(delivery_id, payload)
+    # Save to redis chat stream & persist to DB
+    seq = _save_message_redis(delivery_id, payload)
 
-    seq = r.llen(REDIS_BARGAIN_LIST_KEY.format(delivery_id=delivery_id))
     try:
-        _save_message_db(str(delivery_id), user.id, recipient_id or 0, message, seq)
+        # no recipient: the message went to the whole room, stored as NULL
+        queue_bargain_message(str(delivery_id), user["id"], recipient_id or None, message, seq)
     except Exception:
-        current_app.logger.exception("Failed to save chat message to DB")
+        current_app.logger.exception("Failed to queue chat message for persistence")
 
     room = f"delivery:{delivery_id}"
     emit("chat_message", payload, room=room)
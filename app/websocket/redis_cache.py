@@ -2,6 +2,7 @@ import json
 from app.extensions import r, db
 from app.models import User, Vendor
 from app.auth.jwt_utils import decode_jwt
+from app.utils.redis_batch import redis_batch, push_bounded
 
 CACHE_KEY = "user:session:{user_id}"
 CACHE_EXP = 3600  # 1 hour cache TTL
@@ -58,20 +59,11 @@ def get_user_from_token(token):
     return user
 def _save_chat_redis(room_id: str, msg: dict):
     key = REDIS_CHAT_LIST_KEY.format(room_id=room_id)
+    meta_key = REDIS_CHAT_META_KEY.format(room_id=room_id)
     try:
-        # push message
-        r.rpush(key, json.dumps(msg))
-        # keep list bounded
-        r.ltrim(key, -MAX_CHAT_HISTORY, -1)
-        # reset TTL so active rooms stay alive 24h after last activity
-        r.expire(key, CHAT_TTL)
-        # also touch meta key TTL if exists
-        meta_key = REDIS_CHAT_META_KEY.format(room_id=room_id)
-        try:
-            r.expire(meta_key, CHAT_TTL)
-        except Exception:
-            # meta expiry failure should not break message save
-            pass
+        # push, keep the list bounded, and reset the TTL of the list and its meta key
+        # so active rooms stay alive 24h after last activity -- one round trip
+        with redis_batch() as pipe:
+            push_bounded(pipe, key, json.dumps(msg), MAX_CHAT_HISTORY, ttl=CHAT_TTL, touch=(meta_key,))
     except Exception:
         current_app.logger.exception("failed to push chat message to redis")
-
@@ -1,10 +1,17 @@
 from flask_socketio import Namespace, emit, join_room, leave_room
-from flask import request, g
+from flask import request
 from datetime import datetime
 from app.extensions import db
 from app.database.rider_models import Rider
 from app.database.user_models import User
 from flask_jwt_extended import decode_token
+from app.utils.riders.geo_index import (
+    rider_room, set_rider_available, remove_rider, RIDERS_ROOM,
+)
+from app.utils.riders.live_location import record_location
+from app.utils.riders.profile import get_rider_name
+from app.utils.riders.location_broadcast import queue_location, forget_rider
+from app.websocket.socket_session import open_session, current_identity, close_session
 
 GLOBAL_ROOM = "all_participants"
 
@@ -25,39 +32,56 @@ class RiderNamespace(Namespace):
             token = token.split(" ")[1]
 
         try:
-            decoded = decode_token(token)["sub"]
+            payload = decode_token(token)
+            decoded = payload["sub"]
             client_id = decoded["id"]
         except Exception as e:
             print("Invalid token:", e)
             return False
 
-        # NOW CHECK DATABASE TO KNOW ROLE
-        rider = Rider.query.get(client_id)
-        user = User.query.get(client_id)
-
+        # Role comes from the token when it carries one; only that table is checked
+        rider = None
+        if decoded.get("type", "rider") == "rider":
+            rider = Rider.query.get(client_id)
         if rider:
-            g.client_type = "rider"
-            g.client_id = rider.id
-        elif user:
-            g.client_type = "user"
-            g.client_id = user.id
+            identity = {"id": rider.id, "type": "rider"}
+        elif decoded.get("type") != "rider" and User.query.get(client_id):
+            identity = {"id": client_id, "type": "user"}
         else:
             print("ID does not exist in User or Rider table")
             return False
 
-        print(f"Connected: {g.client_type} {g.client_id}")
+        # resolved once; later events read the identity from the socket session
+        if not open_session(identity, payload):
+            print("Token revoked")
+            return False
+
+        print(f"Connected: {identity['type']} {identity['id']}")
 
         join_room(GLOBAL_ROOM)
+        if identity["type"] == "rider":
+            # orders are dispatched to the nearest riders' own rooms
+            join_room(rider_room(rider.id))
+            join_room(RIDERS_ROOM)
+            set_rider_available(rider.id, bool(rider.is_available))
 
         emit("connected", {
             "message": "Connected",
-            "type": g.client_type,
-            "id": g.client_id,
+            "type": identity["type"],
+            "id": identity["id"],
             "room": GLOBAL_ROOM
         })
 
+    def on_disconnect(self):
+        identity = current_identity()
+        if identity and identity["type"] == "rider":
+            remove_rider(identity["id"])
+            forget_rider(identity["id"])
+        close_session()
+
     def on_update_location(self, data):
-        if g.client_type != "rider":
+        identity = current_identity()
+        if not identity or identity["type"] != "rider":
             emit("error", {"message": "Only riders can send location"})
             return
 
@@ -69,23 +93,13 @@ class RiderNamespace(Namespace):
             emit("error", {"message": "Incomplete location data"})
             return
 
-        rider = Rider.query.get(g.client_id)
-        if not rider:
-            emit("error", {"message": "Rider not found"})
-            return
-
-        # Save location
-        rider.current_lat = lat
-        rider.current_lng = lng
-        rider.current_address = address
-        db.session.commit()
-
-        # Get rider's user info
-        user = User.query.get(rider.user_id)
+        # the rider was checked against the DB on connect; the position goes to
+        # Redis and reaches the riders table through the periodic flusher
+        record_location(identity["id"], lat, lng, address)
 
         data_packet = {
-            "rider_id": g.client_id,
-            "rider_name": user.fullname if user else "Unknown",
+            "rider_id": identity["id"],
+            "rider_name": get_rider_name(identity["id"]),
             "position": {
                 "lat": lat,
                 "lng": lng,
@@ -94,6 +108,7 @@ class RiderNamespace(Namespace):
             "time": datetime.utcnow().isoformat() + "Z"
         }
 
-        emit("location_update", data_packet, room=GLOBAL_ROOM)
+        # sent with the room's next batched "location_updates" event
+        queue_location(GLOBAL_ROOM, data_packet)
 
 
@@ -0,0 +1,130 @@
+"""
+Per-connection identity for Socket.IO namespaces.
+
+A connection is authenticated once, in the namespace's connect handler:
+open_session() stores the resolved identity in the Socket.IO session.
+Every later event reads it back with current_identity(), which involves no
+JWT decoding and no I/O.
+
+flask.session inside socket handlers is one dict per engine.io connection,
+shared by every namespace the client joined over it (/, /vendor, /rider,
+/bargain...). Identities are therefore stored per namespace under
+session["identities"], so one namespace's connect or disconnect never
+changes who another namespace's events act as.
+
+Revocation: revoke_identity() marks every token issued to an identity
+before now as revoked and disconnects its live sockets on every worker.
+revoke_token() revokes a single token by its jti and disconnects the
+sockets that connected with it. Signing out (auth.signout) calls it.
+"""
+import time
+from flask import request, session
+from app.extensions import socketio
+from app.utils.redis_factory import get_redis, SESSIONS
+
+r = get_redis(SESSIONS)
+
+SOCKET_SIDS_KEY = "socket:sids:{identity_key}"          # SET of "namespace|sid" per identity
+SOCKET_JTI_SIDS_KEY = "socket:jti:{jti}"                # SET of "namespace|sid" per token
+REVOKED_TOKEN_KEY = "auth:revoked:{jti}"
+REVOKED_BEFORE_KEY = "auth:revoked_before:{identity_key}"
+
+SIDS_TTL = 24 * 3600
+REVOCATION_TTL = 24 * 3600   # keep markers at least as long as the longest-lived token
+
+
+def identity_key(identity):
+    return f"{identity.get('type', 'user')}:{identity['id']}"
+
+
+def is_token_revoked(identity, payload=None):
+    """
+    True if the token behind `identity` was revoked, by jti or by a
+    revoke_identity() after it was issued. Tokens without iat count as
+    issued before any revocation. One Redis round trip.
+    """
+    payload = payload or {}
+    before_key = REVOKED_BEFORE_KEY.format(identity_key=identity_key(identity))
+    if payload.get("jti"):
+        token_revoked, revoked_before = r.mget(REVOKED_TOKEN_KEY.format(jti=payload["jti"]), before_key)
+    else:
+        token_revoked, revoked_before = None, r.get(before_key)
+    if token_revoked:
+        return True
+    if revoked_before is None:
+        return False
+    issued_at = payload.get("iat")
+    return issued_at is None or float(issued_at) <= float(revoked_before)
+
+
+def open_session(identity, payload=None):
+    """
+    Store the connection's identity (a dict with at least "id" and "type").
+    Call from a connect handler; returns False (reject the connection) when
+    the token has been revoked.
+    """
+    if is_token_revoked(identity, payload):
+        return False
+    jti = (payload or {}).get("jti")
+    session.setdefault("identities", {})[request.namespace] = identity
+    session.setdefault("jtis", {})[request.namespace] = jti
+    entry = f"{request.namespace}|{request.sid}"
+    keys = [SOCKET_SIDS_KEY.format(identity_key=identity_key(identity))]
+    if jti:
+        keys.append(SOCKET_JTI_SIDS_KEY.format(jti=jti))
+    pipe = r.pipeline()
+    for key in keys:
+        pipe.sadd(key, entry)
+        pipe.expire(key, SIDS_TTL)
+    pipe.execute()
+    return True
+
+
+def current_identity():
+    """The identity stored at connect for this namespace, or None. No I/O."""
+    return session.get("identities", {}).get(request.namespace)
+
+
+def close_session():
+    """Forget this namespace's connection; call from the namespace's disconnect handler."""
+    identity = session.get("identities", {}).pop(request.namespace, None)
+    jti = session.get("jtis", {}).pop(request.namespace, None)
+    if not identity:
+        return
+    entry = f"{request.namespace}|{request.sid}"
+    pipe = r.pipeline()
+    pipe.srem(SOCKET_SIDS_KEY.format(identity_key=identity_key(identity)), entry)
+    if jti:
+        pipe.srem(SOCKET_JTI_SIDS_KEY.format(jti=jti), entry)
+    pipe.execute()
+
+
+def _disconnect(sids_key):
+    """Disconnect every "namespace|sid" in `sids_key` and drop the set. Returns how many."""
+    entries = r.smembers(sids_key)
+    r.delete(sids_key)
+    for entry in entries:
+        namespace, sid = entry.split("|", 1)
+        socketio.server.disconnect(sid, namespace=namespace)
+    return len(entries)
+
+
+def revoke_token(jti, ttl=REVOCATION_TTL):
+    """
+    Revoke a single token: it is refused on its next connect, and the
+    sockets that connected with it are disconnected. Returns how many.
+    """
+    r.setex(REVOKED_TOKEN_KEY.format(jti=jti), ttl, "1")
+    return _disconnect(SOCKET_JTI_SIDS_KEY.format(jti=jti))
+
+
+def revoke_identity(identity, ttl=REVOCATION_TTL):
+    """
+    Revoke every token issued to this identity so far and disconnect its
+    open sockets. Disconnects go through the Socket.IO message queue, so
+    they reach sockets held by other workers too. Returns how many sockets
+    were disconnected.
+    """
+    key = identity_key(identity)
+    r.setex(REVOKED_BEFORE_KEY.format(identity_key=key), ttl, time.time())
+    return _disconnect(SOCKET_SIDS_KEY.format(identity_key=key))
@@ -3,6 +3,7 @@
 from flask_socketio import emit, join_room
 from app.extensions import socketio
 from app.auth.jwt_utils import decode_jwt  # your JWT decoder
+from app.websocket.socket_session import open_session, close_session
 
 @socketio.on("connect", namespace="/vendor")
 def vendor_connect(auth=None):
@@ -23,13 +24,22 @@ def vendor_connect(auth=None):
     if not vendor:
         return False
 
-    # Use vendor's name to create room
-    room_id = get_vendor_room(vendor.user_id, vendor.name)
+    # resolved once; later events read the identity from the socket session
+    if not open_session({"id": vendor.id, "user_id": vendor.user_id, "type": "vendor"}, payload):
+        return False
+
+    # the vendor row is already loaded, no second lookup for the room
+    room_id = f"vendor_{vendor.id}"
     join_room(room_id)
 
     emit("connected", {"message": "connected to vendor room", "room": room_id})
 
 
+@socketio.on("disconnect", namespace="/vendor")
+def vendor_disconnect():
+    close_session()
+
+
 
 def get_vendor_room(user_id: int, vendor_name: str) -> str:
     """
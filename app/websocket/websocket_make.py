@@ -1,3 +1,5 @@
+from app.utils.redis_batch import redis_batch, push_bounded
+
 def make_room_id(user1: str, user2: str) -> str:
     """Create unique shared room id for any 2 users."""
     return "_".join(sorted([user1, user2]))
@@ -6,8 +8,8 @@ def make_room_id(user1: str, user2: str) -> str:
 def save_message_redis(room_id: str, msg: dict):
     """Append a message to Redis list for this room."""
     key = REDIS_CHAT_LIST_KEY.format(room_id=room_id)
-    r.rpush(key, json.dumps(msg))
-    r.ltrim(key, -MAX_CHAT_HISTORY, -1)
+    with redis_batch() as pipe:
+        push_bounded(pipe, key, json.dumps(msg), MAX_CHAT_HISTORY)
 
 
 def get_message_history(room_id: str, limit: int = 50):
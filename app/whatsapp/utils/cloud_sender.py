@@ -0,0 +1,151 @@
+"""
+Long-lived sender for the WhatsApp Cloud API.
+
+One WhatsAppSender per phone number id per worker, from get_whatsapp_sender().
+It keeps a requests.Session with a bounded keep-alive connection pool,
+so sends after the first skip the TCP+TLS handshake.
+
+- Concurrency: at most WHATSAPP_MAX_CONCURRENCY requests in flight. Extra
+  callers wait for a slot.
+- Retries: 429 and 5xx responses, and failures to connect at all, are
+  retried up to WHATSAPP_MAX_RETRIES times with exponential backoff and
+  jitter, honoring Retry-After. Backoff waits do not hold a slot. A read
+  timeout or a connection dropped after the request went out is not
+  retried: POST /messages is not idempotent and Meta may already have
+  accepted the message.
+- Metrics: sent, failed, retried, rate-limited and average latency per
+  phone number id, under the "whatsapp" metrics name.
+"""
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from config import Config
+from app.utils.metrics import Counters, register_metrics
+
+logger = logging.getLogger(__name__)
+
+GRAPH_URL = "https://graph.facebook.com/{version}/{phone_number_id}/messages"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 30       # seconds; longer Retry-After values are capped
+
+sender_counters = Counters()
+_senders = {}              # (token, phone_number_id, version) -> WhatsAppSender
+_lock = threading.Lock()
+
+
+class WhatsAppSender:
+    """Pooled, keep-alive Cloud API client for one phone number id."""
+
+    def __init__(self, token, phone_number_id, api_version,
+                 max_concurrency=8, max_retries=3, timeout=10, backoff=0.5):
+        if not token or not phone_number_id:
+            raise ValueError("WHATSAPP_TOKEN and META_PHONE_NUMBER_ID must be set")
+        self.phone_number_id = phone_number_id
+        self.url = GRAPH_URL.format(version=api_version, phone_number_id=phone_number_id)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency))
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        })
+
+    def send_text(self, to, message, timeout=None):
+        return self.send({
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {"body": message},
+        }, timeout=timeout)
+
+    def send(self, payload, timeout=None):
+        """POST one message payload; returns the API's JSON or raises after the last retry."""
+        label = self.phone_number_id
+        for attempt in range(self.max_retries + 1):
+            response = None
+            started = time.perf_counter()
+            try:
+                with self._slots:
+                    response = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                if not _never_sent(e):
+                    break
+            else:
+                sender_counters.incr(label, "latency_ms", int((time.perf_counter() - started) * 1000))
+                sender_counters.incr(label, "requests")
+                if response.status_code < 400:
+                    sender_counters.incr(label, "sent")
+                    return response.json()
+                if response.status_code == 429:
+                    sender_counters.incr(label, "rate_limited")
+                error = requests.HTTPError(f"{response.status_code} {response.text[:200]}", response=response)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+
+            if attempt == self.max_retries:
+                break
+            sender_counters.incr(label, "retried")
+            time.sleep(self._delay(attempt, response))
+
+        sender_counters.incr(label, "failed")
+        logger.error("WhatsApp send via %s failed: %s", label, error)
+        raise error
+
+    def _delay(self, attempt, response):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def close(self):
+        self.session.close()
+
+
+def _never_sent(error):
+    """True when the request failed before reaching Meta, so sending it again cannot duplicate it."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def get_whatsapp_sender(token=None, phone_number_id=None, api_version=None):
+    """The shared sender for these credentials (defaults from config), created on first use."""
+    key = (
+        token or Config.WHATSAPP_TOKEN,
+        phone_number_id or Config.META_PHONE_NUMBER_ID,
+        api_version or Config.WHATSAPP_API_VERSION,
+    )
+    sender = _senders.get(key)
+    if sender is None:
+        with _lock:
+            sender = _senders.get(key)
+            if sender is None:
+                sender = WhatsAppSender(
+                    *key,
+                    max_concurrency=Config.WHATSAPP_MAX_CONCURRENCY,
+                    max_retries=Config.WHATSAPP_MAX_RETRIES,
+                    timeout=Config.WHATSAPP_TIMEOUT,
+                )
+                _senders[key] = sender
+    return sender
+
+
+def sender_metrics():
+    metrics = sender_counters.snapshot()
+    for values in metrics.values():
+        requests_made = values.get("requests", 0)
+        values["latency_ms_avg"] = round(values.pop("latency_ms", 0) / requests_made, 1) if requests_made else 0.0
+    return metrics
+
+
+register_metrics("whatsapp", sender_metrics)
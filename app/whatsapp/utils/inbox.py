@@ -0,0 +1,303 @@
+"""
+Fast-ack ingestion for the WhatsApp webhook.
+
+The webhook only verifies the signature and calls enqueue_message() for
+each inbound message, then returns 200. enqueue_message() is one Lua call.
+It drops message ids already seen in the last DEDUPE_TTL, so Meta's
+retries are not processed twice; messages without an id (the legacy flat
+payload) are never deduped, since a user may well send "1" twice. It
+appends the message to that phone's inbox and, if the phone is not
+already scheduled, puts it on the ready queue.
+
+Worker threads (WHATSAPP_WORKERS per process) pop phones from the ready
+queue. A worker takes a short lease on the phone and runs
+WhatsAppFlow for its messages one by one, oldest first. The lease and
+the phone's deadline are extended before every message, and the turn
+stops if the lease was lost. While the lease is held no other worker
+touches that phone, so each conversation is processed in order, while
+different phones run in parallel.
+
+Redis layout:
+    whatsapp:seen:{message_id}    dedupe marker
+    whatsapp:inbox:{phone}        LIST of message JSON, oldest first
+    whatsapp:ready                LIST of phones with work
+    whatsapp:scheduled            ZSET phone -> deadline (queued or in progress)
+    whatsapp:lease:{phone}        worker holding the phone
+
+A phone whose worker died keeps its scheduled entry past the deadline
+with no lease. The reaper puts it back on the ready queue, unless the
+phone is already waiting there (a backlog, not a dead worker).
+"""
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from app.extensions import r
+from app.utils.metrics import Counters, register_metrics
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SEEN_KEY = "whatsapp:seen:{message_id}"
+INBOX_KEY = "whatsapp:inbox:{phone}"
+READY_KEY = "whatsapp:ready"
+SCHEDULED_KEY = "whatsapp:scheduled"
+LEASE_KEY = "whatsapp:lease:{phone}"
+FAILED_KEY = "whatsapp:failed"
+
+DEDUPE_TTL = 24 * 3600
+INBOX_TTL = 24 * 3600
+LEASE_SECONDS = 300        # longer than one flow can take: AI parsing plus sender retries
+MESSAGES_PER_TURN = 20     # then the phone goes to the back of the ready queue
+POP_TIMEOUT = 1            # seconds; stays below the Redis socket timeout
+REAP_EVERY = 30
+FAILED_MAXLEN = 1000
+
+# KEYS: seen, inbox, scheduled, ready   ARGV: phone, message json, dedupe ttl (0: no dedupe), inbox ttl, deadline
+# -> 1 queued, 0 duplicate
+_ENQUEUE_LUA = """
+if tonumber(ARGV[3]) > 0 and not redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[3]) then
+    return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+if redis.call('ZADD', KEYS[3], 'NX', ARGV[5], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[4], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: lease, scheduled   ARGV: phone, lease token, lease ms, deadline, "take" | "extend"
+# -> 1 lease taken or extended (and the deadline pushed back), 0 held by another worker or lost
+_LEASE_LUA = """
+local holder = redis.call('GET', KEYS[1])
+if holder and holder ~= ARGV[2] then
+    return 0
+end
+if not holder and ARGV[5] == 'extend' then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+redis.call('ZADD', KEYS[2], 'XX', ARGV[4], ARGV[1])
+return 1
+"""
+
+# KEYS: inbox, scheduled, ready, lease   ARGV: phone, lease token, next deadline
+# -> 1 requeued (more messages), 0 done, -1 another worker holds the phone now
+_FINISH_LUA = """
+local holder = redis.call('GET', KEYS[4])
+if holder and holder ~= ARGV[2] then
+    return -1
+end
+redis.call('DEL', KEYS[4])
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('RPUSH', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: scheduled, ready   ARGV: now, next deadline, lease key prefix, phones...
+# -> phones requeued: overdue, no lease, and not already waiting in the ready list
+_REAP_LUA = """
+local requeued = {}
+for i = 4, #ARGV do
+    local phone = ARGV[i]
+    local deadline = redis.call('ZSCORE', KEYS[1], phone)
+    if deadline and tonumber(deadline) <= tonumber(ARGV[1])
+            and redis.call('EXISTS', ARGV[3] .. phone) == 0 then
+        redis.call('ZADD', KEYS[1], 'XX', ARGV[2], phone)
+        if not redis.call('LPOS', KEYS[2], phone) then
+            redis.call('RPUSH', KEYS[2], phone)
+            requeued[#requeued + 1] = phone
+        end
+    end
+end
+return requeued
+"""
+
+_enqueue_script = r.register_script(_ENQUEUE_LUA)
+_lease_script = r.register_script(_LEASE_LUA)
+_finish_script = r.register_script(_FINISH_LUA)
+_reap_script = r.register_script(_REAP_LUA)
+
+inbox_counters = Counters()
+_state = {"started": False, "reaped_at": 0.0}
+_state_lock = threading.Lock()
+
+
+def extract_messages(payload):
+    """
+    Inbound messages as (message_id, phone, text). Accepts Meta's
+    entry/changes/value/messages envelope, or a single flat message
+    ({"id", "from", "text": {"body"}}). message_id is None when the
+    message carries no id.
+    """
+    if "entry" in payload:
+        messages = [
+            message
+            for entry in payload.get("entry") or []
+            for change in entry.get("changes") or []
+            for message in (change.get("value") or {}).get("messages") or []
+        ]
+    else:
+        messages = [payload]
+    extracted = []
+    for message in messages:
+        phone = message.get("from")
+        if not phone:
+            continue
+        text = ((message.get("text") or {}).get("body") or "").strip()
+        extracted.append((message.get("id"), phone, text))
+    return extracted
+
+
+def enqueue_message(message_id, phone, text):
+    """
+    Queue one inbound message for its phone's worker. Returns False for a
+    duplicate id; a message_id of None is never treated as a duplicate.
+    """
+    dedupe = message_id is not None
+    message_id = message_id if dedupe else f"local-{uuid.uuid4().hex}"
+    data = json.dumps({"id": message_id, "phone": phone, "text": text, "received_at": time.time()})
+    queued = _enqueue_script(
+        keys=[
+            SEEN_KEY.format(message_id=message_id),
+            INBOX_KEY.format(phone=phone),
+            SCHEDULED_KEY,
+            READY_KEY,
+        ],
+        args=[phone, data, DEDUPE_TTL if dedupe else 0, INBOX_TTL, time.time() + LEASE_SECONDS],
+    )
+    inbox_counters.incr("messages", "received" if queued else "duplicates")
+    return bool(queued)
+
+
+# ---------------------- Workers ----------------------
+def _process(message):
+    # imported here: whatsapphandler imports this module for the webhook
+    from flask import current_app
+    from app.whatsapp.whatsapphandler import WhatsAppFlow
+    from app.whatsapp.utils.cloud_sender import get_whatsapp_sender
+
+    sender = get_whatsapp_sender(
+        token=current_app.config["WHATSAPP_TOKEN"],
+        phone_number_id=current_app.config["META_PHONE_NUMBER_ID"],
+        api_version=current_app.config["WHATSAPP_API_VERSION"],
+    )
+    WhatsAppFlow(message["phone"], message["text"], sender).run()
+
+
+def _failed(message, error):
+    inbox_counters.incr("messages", "failed")
+    logger.exception("WhatsApp flow failed for message %s", message.get("id"))
+    pipe = r.pipeline(transaction=False)
+    pipe.lpush(FAILED_KEY, json.dumps(dict(message, error=str(error)[:500], failed_at=time.time())))
+    pipe.ltrim(FAILED_KEY, 0, FAILED_MAXLEN - 1)
+    pipe.execute()
+
+
+def _lease(phone, token, mode):
+    return _lease_script(
+        keys=[LEASE_KEY.format(phone=phone), SCHEDULED_KEY],
+        args=[phone, token, LEASE_SECONDS * 1000, time.time() + LEASE_SECONDS, mode],
+    )
+
+
+def process_phone(phone, token):
+    """One turn for `phone`: up to MESSAGES_PER_TURN messages in order, under a lease."""
+    if not _lease(phone, token, "take"):
+        inbox_counters.incr("messages", "lease_busy")
+        return 0   # another worker has this phone; it requeues leftovers when it finishes
+    inbox_key = INBOX_KEY.format(phone=phone)
+    handled = 0
+    try:
+        while handled < MESSAGES_PER_TURN:
+            if handled and not _lease(phone, token, "extend"):
+                # the lease expired mid-turn and the phone may be with another worker now
+                inbox_counters.incr("messages", "lease_lost")
+                logger.warning("Lost the WhatsApp inbox lease for %s; ending its turn", phone)
+                break
+            raw = r.lpop(inbox_key)
+            if raw is None:
+                break
+            message = json.loads(raw)
+            handled += 1
+            try:
+                _process(message)
+            except Exception as e:
+                # flows move money and send messages; never rerun one automatically
+                _failed(message, e)
+                continue
+            inbox_counters.incr("messages", "processed")
+            inbox_counters.incr("messages", "latency_ms", int((time.time() - message["received_at"]) * 1000))
+    finally:
+        _finish_script(
+            keys=[inbox_key, SCHEDULED_KEY, READY_KEY, LEASE_KEY.format(phone=phone)],
+            args=[phone, token, time.time() + LEASE_SECONDS],
+        )
+    return handled
+
+
+def reap_abandoned(now=None):
+    """
+    Requeue phones whose deadline passed with no live lease (their worker
+    died) and that are not already waiting in the ready list. Returns how many.
+    """
+    now = now or time.time()
+    overdue = r.zrangebyscore(SCHEDULED_KEY, "-inf", now, start=0, num=500)
+    if not overdue:
+        return 0
+    requeued = _reap_script(
+        keys=[SCHEDULED_KEY, READY_KEY],
+        args=[now, now + LEASE_SECONDS, LEASE_KEY.format(phone=""), *overdue],
+    )
+    if requeued:
+        inbox_counters.incr("messages", "reaped", len(requeued))
+    return len(requeued)
+
+
+def _worker_loop(app, token):
+    while True:
+        try:
+            popped = r.blpop(READY_KEY, timeout=POP_TIMEOUT)
+            if popped:
+                with app.app_context():
+                    process_phone(popped[1], token)
+            if time.time() - _state["reaped_at"] > REAP_EVERY:
+                _state["reaped_at"] = time.time()
+                reap_abandoned()
+        except Exception:
+            logger.exception("WhatsApp inbox worker failed; will retry")
+            time.sleep(POP_TIMEOUT)
+
+
+def start_whatsapp_workers(app, count=None):
+    """Start the inbox worker threads (once per process)."""
+    with _state_lock:
+        if _state["started"]:
+            return
+        _state["started"] = True
+    for n in range(count or Config.WHATSAPP_WORKERS):
+        token = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        thread = threading.Thread(target=_worker_loop, args=(app, token), daemon=True, name=f"whatsapp-inbox-{n}")
+        thread.start()
+
+
+def inbox_metrics():
+    metrics = inbox_counters.snapshot().get("messages", {})
+    processed = metrics.get("processed", 0)
+    metrics["latency_ms_avg"] = round(metrics.pop("latency_ms", 0) / processed, 1) if processed else 0.0
+    pipe = r.pipeline(transaction=False)
+    pipe.llen(READY_KEY)
+    pipe.zcard(SCHEDULED_KEY)
+    pipe.llen(FAILED_KEY)
+    metrics["phones_ready"], metrics["phones_scheduled"], metrics["failed_kept"] = pipe.execute()
+    return metrics
+
+
+register_metrics("whatsapp_inbox", inbox_metrics)
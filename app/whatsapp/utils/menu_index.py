@@ -0,0 +1,151 @@
+import re
+import threading
+from collections import OrderedDict
+from app.utils.catalog.loader import load_menus_for_vendors
+from app.utils.catalog.snapshot import get_catalog_version
+
+MAX_VENDOR_INDEXES = 500   # per-process LRU bound
+MIN_MATCH_SCORE = 0.45     # below this a parsed name is treated as "not on the menu"
+MIN_SUGGEST_SCORE = 0.3    # weakest candidate still worth suggesting back to the customer
+MAX_CANDIDATES = 3
+NGRAM_SIZE = 3
+
+# words customers add around item names that say nothing about the item
+NOISE_WORDS = {"quantity", "quantities", "qty", "pcs", "pieces", "piece", "plate", "plates", "portion", "portions", "of", "and", "x"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_name(name):
+    """Lowercase, drop punctuation and noise words, collapse whitespace."""
+    words = [w for w in _WORD_RE.findall((name or "").lower()) if w not in NOISE_WORDS and not w.isdigit()]
+    return " ".join(words)
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """Character n-grams of a normalized name, padded so short words still get grams."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _dice(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class MenuEntry:
+    __slots__ = ("product_id", "name", "price", "norm", "tokens", "token_grams", "grams")
+
+    def __init__(self, product_id, name, price):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.norm = normalize_name(name)
+        self.tokens = set(self.norm.split())
+        self.token_grams = [ngrams(token) for token in self.tokens]
+        self.grams = ngrams(self.norm)
+
+
+class MenuIndex:
+    """
+    Fuzzy lookup over one vendor's menu, built once from the DB.
+    Candidates are found through an n-gram inverted index and scored by a
+    blend of whole-name n-gram similarity and per-word similarity, so both
+    "jollof" and a misspelt "shawama" find their item.
+    """
+
+    def __init__(self, vendor_id, items):
+        self.vendor_id = vendor_id
+        self.entries = [MenuEntry(item.id, item.item_name, item.price) for item in items if item.item_name]
+        self.by_norm = {entry.norm: entry for entry in self.entries}
+        self.gram_index = {}
+        for pos, entry in enumerate(self.entries):
+            for gram in entry.grams:
+                self.gram_index.setdefault(gram, []).append(pos)
+
+    def _score(self, norm, token_grams, grams, entry):
+        name_sim = _dice(grams, entry.grams)
+        # each query word against its closest word in the menu name
+        word_sim = sum(
+            max((_dice(tg, eg) for eg in entry.token_grams), default=0.0) for tg in token_grams
+        ) / len(token_grams)
+        score = 0.5 * name_sim + 0.5 * word_sim
+        if norm in entry.norm:
+            # what the old ilike('%name%') lookup accepted
+            score = max(score, 0.9)
+        return score
+
+    def match(self, name, limit=MAX_CANDIDATES):
+        """Ranked [(score, MenuEntry), ...] for a parsed item name, best first."""
+        norm = normalize_name(name)
+        if not norm:
+            return []
+        exact = self.by_norm.get(norm)
+        if exact:
+            return [(1.0, exact)]
+
+        token_grams = [ngrams(token) for token in set(norm.split())]
+        grams = ngrams(norm)
+        positions = set()
+        for gram in grams:
+            positions.update(self.gram_index.get(gram, ()))
+
+        scored = [(self._score(norm, token_grams, grams, self.entries[pos]), self.entries[pos]) for pos in positions]
+        scored.sort(key=lambda pair: (-pair[0], pair[1].product_id))
+        return scored[:limit]
+
+
+_indexes = OrderedDict()  # vendor_id -> (catalog_version, MenuIndex)
+_lock = threading.Lock()
+
+
+def get_menu_index(vendor_id):
+    """
+    The vendor's MenuIndex, rebuilt only after the catalog version changes
+    (any committed FoodItem write bumps it).
+    """
+    version = get_catalog_version()
+    with _lock:
+        cached = _indexes.get(vendor_id)
+        if cached and cached[0] == version:
+            _indexes.move_to_end(vendor_id)
+            return cached[1]
+
+    index = MenuIndex(vendor_id, load_menus_for_vendors([vendor_id])[vendor_id])
+    with _lock:
+        _indexes[vendor_id] = (version, index)
+        _indexes.move_to_end(vendor_id)
+        while len(_indexes) > MAX_VENDOR_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def match_items(vendor_id, items):
+    """
+    Match a whole parsed order against the vendor's menu in memory.
+    Returns (validated, unmatched): validated rows carry product_id/name/qty/price,
+    unmatched rows carry the parsed name and up to MAX_CANDIDATES suggestions.
+    """
+    index = get_menu_index(vendor_id)
+    validated, unmatched = [], []
+    for it in items:
+        name = it["name"]
+        qty = int(it.get("qty", 1))
+        ranked = index.match(name)
+        if ranked and ranked[0][0] >= MIN_MATCH_SCORE:
+            entry = ranked[0][1]
+            validated.append({
+                "product_id": entry.product_id,
+                "name": entry.name,
+                "qty": qty,
+                "price": entry.price,
+            })
+        else:
+            unmatched.append({
+                "name": name,
+                "candidates": [entry.name for score, entry in ranked if score >= MIN_SUGGEST_SCORE],
+            })
+    return validated, unmatched
@@ -1,5 +1,6 @@
 from app.database import db
 from app.database.models import FoodItem, OrderSingle, OrderMultiple
+from app.whatsapp.utils.menu_index import match_items
 import re
 import openai
 
@@ -79,26 +80,13 @@ Input:
         return []
 
 def validate_items(vendor_id: int, items):
-    validated = []
-    for it in items:
-        name = it["name"]
-        qty = int(it.get("qty", 1))
-
-        product = FoodItem.query.filter(
-            FoodItem.vendor_id == vendor_id,
-            FoodItem.item_name.ilike(f"%{name}%")
-        ).first()
-
-        if not product:
-            return False, []
-
-        validated.append({
-            "product_id": product.id,
-            "name": product.item_name,
-            "qty": qty,
-            "price": product.price
-        })
-
+    """
+    Match parsed items against the vendor's in-memory menu index.
+    No database call unless the vendor's index has to be (re)built.
+    """
+    validated, unmatched = match_items(vendor_id, items)
+    if unmatched:
+        return False, []
     return True, validated
 
 def build_order(user_id, vendor_name, items, address):
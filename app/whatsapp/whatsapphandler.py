@@ -1,7 +1,6 @@
 import uuid
 import hmac
 import hashlib
-import requests
 
 from functools import wraps
 from flask import request, Blueprint, jsonify, current_app
@@ -20,6 +19,8 @@ from app.delivery.redirect import redirect_to_bargain
 from app.ai.parsers import ai_parse_items, ai_parse_address
 from app.database.models import User, Vendor
 from app import ws
+from app.whatsapp.utils.cloud_sender import get_whatsapp_sender
+from app.whatsapp.utils.inbox import extract_messages, enqueue_message
 
 
 
@@ -32,27 +33,10 @@ class WhatsAppClient:
         self.api_version = api_version
         self.base = f"https://graph.facebook.com/{self.api_version}"
 
-    def _headers(self):
-        return {
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json'
-        }
-
     def send_text(self, to: str, message: str, timeout: int = 10):
-        url = f"{self.base}/{self.phone_number_id}/messages"
-        payload = {
-            'messaging_product': 'whatsapp',
-            'to': to,
-            'type': 'text',
-            'text': {'body': message}
-        }
-        resp = requests.post(url, headers=self._headers(), json=payload, timeout=timeout)
-        try:
-            resp.raise_for_status()
-        except Exception:
-            current_app.logger.exception("WhatsApp send failed: %s", resp.text)
-            raise
-        return resp.json()
+        # goes through the shared keep-alive sender for these credentials
+        sender = get_whatsapp_sender(self.token, self.phone_number_id, self.api_version)
+        return sender.send_text(to, message, timeout=timeout)
 
 
 
@@ -312,18 +296,26 @@ def whatsapp_webhook():
             current_app.logger.warning("Invalid webhook signature")
             return 'Invalid signature', 401
 
-    # --- EXTRACT MESSAGE (UNCHANGED) ---
-    payload = request.get_json(force=True)
+    payload = request.get_json(force=True, silent=True) or {}
+
+    # --- QUEUE MODE: ack now, inbox workers run the flows in order per phone ---
+    if current_app.config.get("WHATSAPP_WEBHOOK_MODE", "queue") == "queue":
+        for message_id, phone, text in extract_messages(payload):
+            enqueue_message(message_id, phone, text)
+        return "", 200
+
+    # --- INLINE MODE ---
     phone = payload.get("from")
     text = payload.get("text", {}).get("body", "").strip()
 
     if not phone:
         return "Missing phone", 400
 
-    sender = WhatsAppClient(
+    # one pooled sender per worker, not a new client per inbound message
+    sender = get_whatsapp_sender(
         token=current_app.config["WHATSAPP_TOKEN"],
         phone_number_id=current_app.config["META_PHONE_NUMBER_ID"],
-        api_version=current_app.config["META_API_VERSION"],
+        api_version=current_app.config["WHATSAPP_API_VERSION"],
     )
 
     flow = WhatsAppFlow(phone, text, sender)
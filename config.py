@@ -8,9 +8,38 @@ class Config:
 
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///gofood.db")
+    # one engine per worker (app/utils/db_engine.py); size so that
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the server's max_connections
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "True").lower() == "true"
+    # read replicas for opted-in GET endpoints (app/utils/db_routing.py), comma-separated URLs
+    DB_REPLICA_URLS = [u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+    # replicas further behind than this (seconds) are skipped; lag is re-checked every interval
+    DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", "5"))
+    DB_REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_LAG_CHECK_INTERVAL", "5"))
+    # after committing a write, a user reads from the primary this long (keep above DB_REPLICA_MAX_LAG)
+    DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", "10"))
 
     # Redis / SocketIO
-    SOCKETIO_MESSAGE_QUEUE = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE", REDIS_URL)
+    # logical clients (app/utils/redis_factory.py); each falls back to REDIS_URL
+    REDIS_URLS = {
+        "cache": os.environ.get("REDIS_URL_CACHE") or REDIS_URL,
+        "sessions": os.environ.get("REDIS_URL_SESSIONS") or REDIS_URL,
+        "pubsub": os.environ.get("REDIS_URL_PUBSUB") or REDIS_URL,
+        "chat": os.environ.get("REDIS_URL_CHAT") or REDIS_URL,
+    }
+    # per pool: at most N connections; callers wait up to POOL_TIMEOUT seconds for a free one
+    REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", "2"))
+    REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", "5"))
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", "2"))
+    # idle connections are PINGed before reuse after this many seconds
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", "30"))
 
     # File Uploads
     UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
@@ -27,6 +56,35 @@ class Config:
     MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "minioaccesskey")
     MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "miniosecretkey")
     MINIO_SECURE = bool(int(os.environ.get("MINIO_SECURE", 0)))
+    MINIO_URL_EXPIRES = int(os.environ.get("MINIO_URL_EXPIRES", "3600"))
+    MINIO_URL_REFRESH_MARGIN = int(os.environ.get("MINIO_URL_REFRESH_MARGIN", "300"))
+    MINIO_URL_CACHE_SIZE = int(os.environ.get("MINIO_URL_CACHE_SIZE", "10000"))
+
+    # Catalog snapshots (/store); keep below MINIO_URL_EXPIRES
+    CATALOG_SNAPSHOT_MAX_AGE = int(os.environ.get("CATALOG_SNAPSHOT_MAX_AGE", "1800"))
+    # Optional JSON file overriding the item category rules (app/utils/catalog/categories.py)
+    CATEGORY_RULES_FILE = os.environ.get("CATEGORY_RULES_FILE", "")
+
+    # Rider dispatch: offer each order to the K nearest available riders,
+    # widening the search radius (km) step by step until K are found
+    RIDER_DISPATCH_COUNT = int(os.environ.get("RIDER_DISPATCH_COUNT", "5"))
+    RIDER_DISPATCH_RADII_KM = [float(x) for x in os.environ.get("RIDER_DISPATCH_RADII_KM", "2,5,10").split(",")]
+    # seconds without a location update before a rider drops out of dispatch
+    RIDER_LOCATION_STALE_AFTER = int(os.environ.get("RIDER_LOCATION_STALE_AFTER", "120"))
+    # live rider positions are kept in Redis and written to the riders table every N seconds
+    RIDER_LOCATION_FLUSH_INTERVAL = float(os.environ.get("RIDER_LOCATION_FLUSH_INTERVAL", "10"))
+    # /rider location broadcasts: batched per room every tick, moves under N metres dropped
+    RIDER_BROADCAST_TICK_MS = int(os.environ.get("RIDER_BROADCAST_TICK_MS", "500"))
+    RIDER_BROADCAST_MIN_MOVE_M = float(os.environ.get("RIDER_BROADCAST_MIN_MOVE_M", "10"))
+
+    # notification outbox relay: seconds to wait when the outbox is empty
+    OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "1"))
+
+    # Reverse geocoding: "nominatim", or "offline" for the built-in gazetteer (no network)
+    GEOCODER = os.environ.get("GEOCODER", "nominatim")
+    GEOCODER_USER_AGENT = os.environ.get("GEOCODER_USER_AGENT", "gofood")
+    # coordinates are snapped to this grid (degrees, ~0.0005 = 55 m) before lookup and caching
+    GEOCODE_GRID_DEGREES = float(os.environ.get("GEOCODE_GRID_DEGREES", "0.0005"))
 
     OAUTH_GOOGLE_CLIENT_ID = os.environ.get("OAUTH_GOOGLE_CLIENT_ID")
     OAUTH_GOOGLE_CLIENT_SECRET = os.environ.get("OAUTH_GOOGLE_CLIENT_SECRET")
@@ -51,6 +109,14 @@ class Config:
     WHATSAPP_VERIFY_TOKEN = os.environ.get("WHATSAPP_VERIFY_TOKEN", "verify-token")
     WHATSAPP_APP_SECRET = os.environ.get("WHATSAPP_APP_SECRET", "")
     WHATSAPP_API_VERSION = os.environ.get("WHATSAPP_API_VERSION", "v20.0")
+    # outbound Cloud API sender (app/whatsapp/utils/cloud_sender.py), per worker
+    WHATSAPP_MAX_CONCURRENCY = int(os.environ.get("WHATSAPP_MAX_CONCURRENCY", "8"))
+    WHATSAPP_MAX_RETRIES = int(os.environ.get("WHATSAPP_MAX_RETRIES", "3"))
+    WHATSAPP_TIMEOUT = float(os.environ.get("WHATSAPP_TIMEOUT", "10"))
+    # "queue": webhook acks at once and flows run on inbox workers (app/whatsapp/utils/inbox.py);
+    # "inline": webhook runs the flow before responding
+    WHATSAPP_WEBHOOK_MODE = os.environ.get("WHATSAPP_WEBHOOK_MODE", "queue")
+    WHATSAPP_WORKERS = int(os.environ.get("WHATSAPP_WORKERS", "4"))
 
     # Frontend URLs
     FRONTEND_FUND_URL = os.environ.get("FRONTEND_FUND_URL", "")
@@ -76,6 +142,18 @@ class Config:
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
+    TWILIO_WHATSAPP_FROM = os.getenv("TWILIO_WHATSAPP_FROM", "whatsapp:+14155238886")
+
+    # Notification dispatcher (app/utils/notifications/dispatcher.py): a vendor's
+    # notifications are held this many seconds and sent as one message or digest
+    NOTIFY_DIGEST_WINDOW = float(os.environ.get("NOTIFY_DIGEST_WINDOW", "20"))
+    NOTIFY_TICK = float(os.environ.get("NOTIFY_TICK", "1"))
+    # sends per second per channel, shared by all workers
+    NOTIFY_RATE_LIMITS = {
+        "email": int(os.environ.get("NOTIFY_EMAIL_RATE", "5")),
+        "whatsapp": int(os.environ.get("NOTIFY_WHATSAPP_RATE", "10")),
+    }
+    NOTIFY_EMAIL_FROM = os.environ.get("NOTIFY_EMAIL_FROM") or MAIL_USERNAME or "no-reply@gofood.local"
 
     MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT", "localhost:9000")
     MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "minioaccesskey")